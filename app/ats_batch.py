@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Batch ATS scoring for whole resume corpora (NumPy).
+
+batch_ats_analysis(resumes) returns, for every markdown document, exactly
+what basic_ats_analysis(md) returns, but per-document Python work is
+limited to tokenizing (one regex call + Counter) and picking out the
+level-2 heading lines. Everything else runs on arrays:
+
+- a CSR term-count matrix (documents x raw tokens) gives word_count,
+- a documents x sections boolean matrix gives missing_sections, and
+  ats_score / readability are computed column-wise,
+- keyword stems are aggregated and the per-document top-k (count desc,
+  then stem, then surface form) is selected with one lexsort.
+
+Requires numpy (app/requirements-batch.txt); the deploy pipeline does not.
+"""
+
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from resume_pipeline import (
+    _SECTION_PATTERN,
+    _WORD_RE,
+    compile_section_aliases,
+    normalize_term,
+)
+
+
+def _section_matrix(
+    resumes: Sequence[str],
+    aliases: Optional[Dict[str, Tuple[str, ...]]],
+) -> Tuple[np.ndarray, List[str]]:
+    """
+    N x S presence matrix. Only lines that parse_markdown would turn into
+    level-2 headings are matched, same as ats_from_blocks.
+    """
+    pattern, names = _SECTION_PATTERN if aliases is None else compile_section_aliases(aliases)
+    present = np.zeros((len(resumes), len(names)), dtype=bool)
+    for row, md in enumerate(resumes):
+        if "## " not in md:
+            continue
+        for ln in md.splitlines():
+            if ln.startswith("## "):
+                m = pattern.match(ln[3:].strip())
+                if m:
+                    present[row, int(m.lastgroup[1:])] = True
+    return present, names
+
+
+def _term_matrix(resumes: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]:
+    """CSR pieces (indptr, token ids, counts) plus the token vocabulary."""
+    vocab: Dict[str, int] = {}
+    setdefault = vocab.setdefault
+    indptr = np.zeros(len(resumes) + 1, dtype=np.int64)
+    cols = array("q")
+    vals = array("q")
+    for row, md in enumerate(resumes):
+        counts = Counter(_WORD_RE.findall(md))
+        cols.extend([setdefault(word, len(vocab)) for word in counts])
+        vals.extend(counts.values())
+        indptr[row + 1] = len(cols)
+    return (
+        indptr,
+        np.frombuffer(cols, dtype=np.int64),
+        np.frombuffer(vals, dtype=np.int64),
+        list(vocab),
+    )
+
+
+def _ranked_ids(keys: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """Map each key to the alphabetical rank of its distinct value."""
+    distinct = sorted(set(keys))
+    rank = {k: i for i, k in enumerate(distinct)}
+    return np.fromiter((rank[k] for k in keys), dtype=np.int64, count=len(keys)), distinct
+
+
+def _top_keywords(
+    n_docs: int,
+    indptr: np.ndarray,
+    cols: np.ndarray,
+    vals: np.ndarray,
+    words: List[str],
+    k: int,
+) -> List[List[str]]:
+    stems = [normalize_term(w) for w in words]
+    keep_word = np.fromiter((s is not None for s in stems), dtype=bool, count=len(words))
+    out: List[List[str]] = [[] for _ in range(n_docs)]
+    if not keep_word.any():
+        return out
+
+    stem_of, stem_names = _ranked_ids([s or "" for s in stems])
+    surf_of, surf_names = _ranked_ids([w.lower() for w in words])
+
+    rows = np.repeat(np.arange(n_docs, dtype=np.int64), np.diff(indptr))
+    mask = keep_word[cols]
+    rows, cols, vals = rows[mask], cols[mask], vals[mask]
+    n_stems, n_surf = len(stem_names), len(surf_names)
+
+    # Stem counts per document.
+    stem_key = rows * n_stems + stem_of[cols]
+    stem_groups, stem_inv = np.unique(stem_key, return_inverse=True)
+    stem_counts = np.bincount(stem_inv, weights=vals).astype(np.int64)
+    g_doc, g_stem = stem_groups // n_stems, stem_groups % n_stems
+
+    # Most frequent surface form per (document, stem), ties alphabetical.
+    surf_key = rows * n_surf + surf_of[cols]
+    surf_groups, surf_inv = np.unique(surf_key, return_inverse=True)
+    surf_counts = np.bincount(surf_inv, weights=vals).astype(np.int64)
+    s_surf = surf_groups % n_surf
+    s_group = np.empty(len(surf_groups), dtype=np.int64)
+    s_group[surf_inv] = stem_inv
+    order = np.lexsort((s_surf, -surf_counts, s_group))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = s_group[order][1:] != s_group[order][:-1]
+    best_surface = np.empty(len(stem_groups), dtype=np.int64)
+    best_surface[s_group[order][first]] = s_surf[order][first]
+
+    # Top-k stems per document: count desc, then stem alphabetical.
+    order = np.lexsort((g_stem, -stem_counts, g_doc))
+    d_sorted = g_doc[order]
+    starts = np.searchsorted(d_sorted, d_sorted, side="left")
+    take = order[(np.arange(len(order)) - starts) < k]
+    for doc, surf in zip(g_doc[take].tolist(), best_surface[take].tolist()):
+        out[doc].append(surf_names[surf])
+    return out
+
+
+def batch_ats_analysis(
+    resumes: Sequence[str],
+    aliases: Optional[Dict[str, Tuple[str, ...]]] = None,
+    top_k: int = 15,
+) -> List[Dict[str, Any]]:
+    """
+    Score N markdown resumes at once. Element i equals
+    basic_ats_analysis(resumes[i], aliases=aliases).
+    """
+    n = len(resumes)
+    if n == 0:
+        return []
+
+    indptr, cols, vals, words = _term_matrix(resumes)
+    word_count = np.bincount(
+        np.repeat(np.arange(n), np.diff(indptr)), weights=vals, minlength=n
+    ).astype(np.int64)
+
+    present, names = _section_matrix(resumes, aliases)
+
+    def column(name: str) -> np.ndarray:
+        return present[:, names.index(name)] if name in names else np.zeros(n, dtype=bool)
+
+    n_missing = (~present).sum(axis=1)
+    long_enough = word_count >= 350
+    score = (
+        60
+        + np.where(long_enough, 10, -5)
+        + np.where(column("Skills"), 10, -10)
+        + np.where(column("Experience"), 10, -10)
+        + np.where(column("Projects"), 5, -5)
+        - np.minimum(15, 3 * n_missing)
+    )
+    score = np.clip(score, 0, 100)
+
+    keywords = _top_keywords(n, indptr, cols, vals, words, top_k)
+    names_arr = np.array(names, dtype=object)
+
+    return [
+        {
+            "word_count": int(wc),
+            "ats_score": int(sc),
+            "keywords": kw,
+            "readability": "Good" if good else "Fair",
+            "missing_sections": names_arr[~row].tolist(),
+        }
+        for wc, sc, kw, good, row in zip(
+            word_count.tolist(), score.tolist(), keywords, long_enough.tolist(), present
+        )
+    ]
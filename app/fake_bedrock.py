@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the bedrock-runtime client, for offline load tests.
+
+FakeBedrock answers invoke_model and invoke_model_with_response_stream
+with Anthropic messages payloads (content, stop_reason, usage; stream
+events for the streaming call). Answers are built from the resume inside
+the prompt: build_html_prompt gets the deterministic page in an ```html
+fence, build_ats_json_prompt gets basic_ats_analysis as JSON, and
+build_combined_prompt gets both between the section markers. An
+assistant prefill is continued from where it stops; a request with tools
+(ATS_TOOL) gets a tool_use block instead of text.
+
+A FaultProfile injects, per call:
+- latency sampled from a distribution ("0.2", "uniform:0.1,0.5",
+  "lognormal:0.3,0.5" = median seconds, sigma), scaled by time_scale
+- ThrottlingException, ServiceUnavailableException and daily token quota
+  errors (botocore ClientError with the real codes and messages, so
+  classify_bedrock_error and is_bedrock_fallback_error see what AWS would
+  send), and in-stream throttling events after the first delta
+- stop_reason max_tokens: always when the answer exceeds max_tokens
+  (estimated tokens), and at random with probability truncate
+- chatty ATS answers with prose around the JSON
+
+installed(fake) routes resume_pipeline.aws_client("bedrock-runtime", ...)
+to the fake; everything else still goes to AWS.
+
+Usage:
+    python app/fake_bedrock.py --prompt-file prompt.txt \\
+        --profile '{"latency": "lognormal:0.3,0.5", "throttle": 0.1}'
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+import resume_pipeline
+from resume_pipeline import (
+    COMBINED_ANALYTICS_MARKER,
+    COMBINED_HTML_MARKER,
+    basic_ats_analysis,
+    cut_at_tokens,
+    estimate_tokens,
+    md_to_basic_html,
+)
+
+_RESUME_MARKER = "RESUME_MARKDOWN:\n"
+
+# fault -> (error code, message) as Bedrock sends them
+_FAULTS = {
+    "throttle": ("ThrottlingException", "Rate exceeded"),
+    "unavailable": ("ServiceUnavailableException", "Service is temporarily unavailable"),
+    "quota": ("ThrottlingException", "Too many tokens per day, please wait before trying again."),
+}
+
+
+def parse_latency(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """"0.2" | "fixed:0.2" | "uniform:lo,hi" | "lognormal:median,sigma" (seconds)."""
+    kind, _, args = str(spec).partition(":")
+    if not args:
+        kind, args = "fixed", kind
+    params = tuple(float(a) for a in args.split(","))
+    arity = {"fixed": 1, "uniform": 2, "lognormal": 2}
+    if kind not in arity or len(params) != arity[kind]:
+        raise ValueError(f"Bad latency spec {spec!r}")
+    return kind, params
+
+
+class FaultProfile:
+    """
+    What a fake region does to each call. Rates are probabilities per
+    request; latency is a parse_latency spec; time_scale multiplies every
+    injected sleep (0 = none).
+    """
+
+    def __init__(
+        self,
+        latency: str = "0",
+        throttle: float = 0.0,
+        unavailable: float = 0.0,
+        quota: float = 0.0,
+        stream_throttle: float = 0.0,
+        truncate: float = 0.0,
+        chatty: float = 0.0,
+        time_scale: float = 1.0,
+    ) -> None:
+        self.latency = parse_latency(latency)
+        self.rates = {"throttle": throttle, "unavailable": unavailable, "quota": quota}
+        self.stream_throttle = stream_throttle
+        self.truncate = truncate
+        self.chatty = chatty
+        self.time_scale = time_scale
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any]) -> "FaultProfile":
+        return cls(**spec)
+
+    def sample_latency(self, rng: random.Random) -> float:
+        kind, params = self.latency
+        if kind == "fixed":
+            seconds = params[0]
+        elif kind == "uniform":
+            seconds = rng.uniform(*params)
+        else:
+            median, sigma = params
+            seconds = median * math.exp(rng.gauss(0.0, sigma))
+        return seconds * self.time_scale
+
+
+class _Body:
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+
+    def read(self) -> bytes:
+        return self._data
+
+
+@functools.lru_cache(maxsize=64)
+def _answer(kind: str, resume_md: str, chatty: bool) -> str:
+    """Full answer the fake model gives for a prompt kind (cached: runs repeat)."""
+    html = f"```html\n{md_to_basic_html(resume_md)}\n```"
+    analytics = json.dumps(basic_ats_analysis(resume_md))
+    if chatty:
+        analytics = f"Here is the ATS analysis you asked for:\n{analytics}\nLet me know if you need more."
+    if kind == "html":
+        return html
+    if kind == "ats":
+        return analytics
+    return f"{COMBINED_ANALYTICS_MARKER}\n{analytics}\n{COMBINED_HTML_MARKER}\n{html}"
+
+
+def _prompt_kind(prompt: str) -> str:
+    if COMBINED_HTML_MARKER in prompt:
+        return "combined"
+    if prompt.startswith("Analyze the resume"):
+        return "ats"
+    return "html"
+
+
+class FakeBedrock:
+    """
+    The fake endpoint: one FaultProfile per region (default for the rest),
+    a seeded RNG, and counters of what was served and injected.
+    """
+
+    def __init__(
+        self,
+        profile: Optional[FaultProfile] = None,
+        regions: Optional[Dict[str, FaultProfile]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.profile = profile or FaultProfile()
+        self.regions = regions or {}
+        self.counts: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def client(self, region: str) -> "FakeBedrockRuntime":
+        return FakeBedrockRuntime(self, region)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+    def _roll(self, p: float) -> bool:
+        with self._lock:
+            return p > 0 and self._rng.random() < p
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def respond(self, region: str, operation: str, body: bytes) -> Tuple[str, str, int, int]:
+        """
+        Sleep, maybe fail, then (text, stop_reason, input_tokens,
+        output_tokens) for one request body.
+        """
+        profile = self.regions.get(region, self.profile)
+        with self._lock:
+            delay = profile.sample_latency(self._rng)
+        self._count("calls")
+        if delay > 0:
+            time.sleep(delay)
+        for fault, (code, message) in _FAULTS.items():
+            if self._roll(profile.rates[fault]):
+                self._count(fault)
+                raise ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+        request = json.loads(body)
+        messages = request["messages"]
+        prompt = messages[0]["content"]
+        prefill = messages[1]["content"] if len(messages) > 1 else ""
+        _, _, resume_md = prompt.partition(_RESUME_MARKER)
+        kind = _prompt_kind(prompt)
+        # A forced tool call carries bare JSON input; prose only goes in text.
+        chatty = kind != "html" and not request.get("tools") and self._roll(profile.chatty)
+        answer = _answer(kind, resume_md.rstrip("\n"), chatty)
+        rest = answer[len(prefill):] if answer.startswith(prefill) else answer
+
+        max_tokens = int(request["max_tokens"])
+        text = cut_at_tokens(rest, max_tokens)
+        if text == rest and len(rest) > 1 and self._roll(profile.truncate):
+            text = rest[:len(rest) // 2]
+        stop_reason = "end_turn" if text == rest else "max_tokens"
+        if stop_reason == "max_tokens":
+            self._count("truncated")
+        input_tokens = estimate_tokens(prompt) + estimate_tokens(prefill)
+        return text, stop_reason, input_tokens, estimate_tokens(text)
+
+
+class FakeBedrockRuntime:
+    """Duck-typed bedrock-runtime client for one region of a FakeBedrock."""
+
+    def __init__(self, endpoint: FakeBedrock, region: str) -> None:
+        self.endpoint = endpoint
+        self.region = region
+
+    def invoke_model(self, *, modelId: str, body: bytes, **_: Any) -> Dict[str, Any]:
+        text, stop_reason, input_tokens, output_tokens = self.endpoint.respond(self.region, "InvokeModel", body)
+        content: List[Dict[str, Any]] = [{"type": "text", "text": text}]
+        tools = json.loads(body).get("tools")
+        if tools:
+            # A cut-off tool call arrives with whatever input was complete: none.
+            tool_input = json.loads(text) if stop_reason != "max_tokens" else {}
+            content = [{"type": "tool_use", "id": "toolu_fake", "name": tools[0]["name"], "input": tool_input}]
+            if stop_reason == "end_turn":
+                stop_reason = "tool_use"
+        payload = {
+            "id": "msg_fake",
+            "type": "message",
+            "role": "assistant",
+            "model": modelId,
+            "content": content,
+            "stop_reason": stop_reason,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+        return {"body": _Body(json.dumps(payload).encode("utf-8")), "contentType": "application/json"}
+
+    def invoke_model_with_response_stream(self, *, modelId: str, body: bytes, **_: Any) -> Dict[str, Any]:
+        text, stop_reason, input_tokens, output_tokens = self.endpoint.respond(
+            self.region, "InvokeModelWithResponseStream", body
+        )
+        profile = self.endpoint.regions.get(self.region, self.endpoint.profile)
+        fail_midway = self.endpoint._roll(profile.stream_throttle)
+        if fail_midway:
+            self.endpoint._count("stream_throttle")
+        return {"body": self._events(modelId, text, stop_reason, input_tokens, output_tokens, fail_midway)}
+
+    @staticmethod
+    def _events(
+        model_id: str,
+        text: str,
+        stop_reason: str,
+        input_tokens: int,
+        output_tokens: int,
+        fail_midway: bool,
+        chunk_chars: int = 64,
+    ) -> Iterator[Dict[str, Any]]:
+        def event(data: Dict[str, Any]) -> Dict[str, Any]:
+            return {"chunk": {"bytes": json.dumps(data).encode("utf-8")}}
+
+        yield event({"type": "message_start", "message": {
+            "model": model_id, "usage": {"input_tokens": input_tokens, "output_tokens": 0},
+        }})
+        yield event({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        for i in range(0, len(text), chunk_chars):
+            yield event({"type": "content_block_delta", "index": 0,
+                         "delta": {"type": "text_delta", "text": text[i:i + chunk_chars]}})
+            if fail_midway:
+                yield {"throttlingException": {"message": "Rate exceeded"}}
+                return
+        yield event({"type": "content_block_stop", "index": 0})
+        yield event({"type": "message_delta", "delta": {"stop_reason": stop_reason},
+                     "usage": {"output_tokens": output_tokens}})
+        yield event({"type": "message_stop"})
+
+
+@contextlib.contextmanager
+def installed(fake: FakeBedrock) -> Iterator[FakeBedrock]:
+    """Serve resume_pipeline's bedrock-runtime clients from fake while active."""
+    original = resume_pipeline._aws_handle
+
+    def handle(kind: str, service: str, region: str, timeout: Optional[float] = None) -> Any:
+        if kind == "client" and service == "bedrock-runtime":
+            return fake.client(region)
+        return original(kind, service, region, timeout)
+
+    resume_pipeline._aws_handle = handle
+    try:
+        yield fake
+    finally:
+        resume_pipeline._aws_handle = original
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--prompt-file", required=True, help="prompt text, e.g. from build_html_prompt")
+    ap.add_argument("--profile", default="{}", help="FaultProfile keyword arguments as JSON")
+    ap.add_argument("--max-tokens", type=int, default=4096)
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args(argv)
+
+    fake = FakeBedrock(FaultProfile.from_spec(json.loads(args.profile)), seed=args.seed)
+    with open(args.prompt_file, "r", encoding="utf-8") as f:
+        body = resume_pipeline._anthropic_body(f.read(), args.max_tokens, 0.2)
+    resp = fake.client("local").invoke_model(modelId="fake", body=body)
+    print(resp["body"].read().decode("utf-8"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Job-description matching over an inverted index.
+
+TermIndex maps normalized terms (normalize_term: lowercase, stopwords
+out, light stemming) to postings of (document, weight). Weights are
+sublinear tf x smoothed IDF, L2-normalized per document when the index is
+finalized, so a query is scored by cosine similarity by walking only the
+postings of its own terms.
+
+The same structure serves both directions:
+- index job postings, query with a resume -> best jobs for that resume
+- index resumes, query with a job posting -> best resumes for that job
+
+Job postings are loaded from JSONL, one {"job_id", "title", "text"} object
+per line, or from an index previously written with TermIndex.save.
+
+Usage:
+    python app/job_match.py --jobs jobs.jsonl --resume resume.md
+    python app/job_match.py --resumes resumes/ --job-file posting.txt
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import sys
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from resume_pipeline import _WORD_RE, normalize_term, read_text_file
+
+
+def term_counts(text: str) -> Counter:
+    counts: Counter = Counter()
+    for word, n in Counter(_WORD_RE.findall(text)).items():
+        term = normalize_term(word)
+        if term is not None:
+            counts[term] += n
+    return counts
+
+
+def _weights(counts: Counter, idf: Dict[str, float]) -> Dict[str, float]:
+    """Sublinear tf-idf, L2-normalized; terms unknown to idf are dropped."""
+    w = {t: (1.0 + math.log(n)) * idf[t] for t, n in counts.items() if t in idf}
+    norm = math.sqrt(sum(v * v for v in w.values()))
+    return {t: v / norm for t, v in w.items()} if norm else {}
+
+
+class TermIndex:
+    """
+    Inverted index with precomputed IDF. add() documents, finalize() once,
+    then search() as often as needed.
+    """
+
+    def __init__(self) -> None:
+        self.doc_ids: List[str] = []
+        self.titles: List[str] = []
+        self.idf: Dict[str, float] = {}
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        self._pending: List[Counter] = []
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_id: str, text: str, title: str = "") -> None:
+        if self.postings:
+            raise RuntimeError("TermIndex is finalized; build a new one to add documents")
+        self.doc_ids.append(doc_id)
+        self.titles.append(title)
+        self._pending.append(term_counts(text))
+
+    def finalize(self) -> "TermIndex":
+        n = len(self._pending)
+        df: Counter = Counter()
+        for counts in self._pending:
+            df.update(counts.keys())
+        self.idf = {t: math.log((1 + n) / (1 + d)) + 1.0 for t, d in df.items()}
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        for doc, counts in enumerate(self._pending):
+            for t, w in _weights(counts, self.idf).items():
+                postings.setdefault(t, []).append((doc, w))
+        self.postings = postings
+        self._pending = []
+        return self
+
+    def search(self, text: str, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Top-k documents by cosine similarity to text, best first; ties go
+        to the earlier-added document. Each hit lists the shared terms
+        that contributed most.
+        """
+        query = _weights(term_counts(text), self.idf)
+        scores: Dict[int, float] = {}
+        get = scores.get
+        for t, qw in query.items():
+            for doc, w in self.postings.get(t, ()):
+                scores[doc] = get(doc, 0.0) + qw * w
+        best = heapq.nsmallest(k, scores.items(), key=lambda kv: (-kv[1], kv[0]))
+
+        shared: Dict[int, List[Tuple[float, str]]] = {doc: [] for doc, _ in best}
+        for t, qw in query.items():
+            for doc, w in self.postings.get(t, ()):
+                if doc in shared:
+                    shared[doc].append((qw * w, t))
+        return [
+            {
+                "id": self.doc_ids[doc],
+                "title": self.titles[doc],
+                "score": round(score, 4),
+                "matched_terms": [t for _, t in sorted(shared[doc], reverse=True)[:5]],
+            }
+            for doc, score in best
+        ]
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "doc_ids": self.doc_ids,
+                    "titles": self.titles,
+                    "idf": self.idf,
+                    "postings": self.postings,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "TermIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls()
+        index.doc_ids = data["doc_ids"]
+        index.titles = data["titles"]
+        index.idf = data["idf"]
+        index.postings = {t: [tuple(p) for p in ps] for t, ps in data["postings"].items()}
+        return index
+
+
+def iter_job_postings(path: str) -> Iterable[Dict[str, str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            if "text" not in obj:
+                raise ValueError(f"{path}:{n}: job posting missing 'text'")
+            yield {
+                "job_id": str(obj.get("job_id") or n),
+                "title": str(obj.get("title", "")),
+                "text": str(obj["text"]),
+            }
+
+
+def load_job_index(path: str) -> TermIndex:
+    """Saved index (.json) or JSONL job postings built on the fly."""
+    if path.endswith(".json"):
+        return TermIndex.load(path)
+    index = TermIndex()
+    for job in iter_job_postings(path):
+        index.add(job["job_id"], job["text"], title=job["title"])
+    return index.finalize()
+
+
+def index_resumes(paths: Iterable[str]) -> TermIndex:
+    index = TermIndex()
+    for p in paths:
+        index.add(p, read_text_file(p), title=os.path.basename(p))
+    return index.finalize()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--jobs", help="JSONL job postings or saved .json index")
+    ap.add_argument("--resume", help="resume markdown to match against --jobs")
+    ap.add_argument("--save-index", help="write the --jobs index to this .json path")
+    ap.add_argument("--resumes", help="directory of resume .md files to rank for --job-file")
+    ap.add_argument("--job-file", help="job posting text to match against --resumes")
+    ap.add_argument("-k", type=int, default=10)
+    args = ap.parse_args(argv)
+
+    if args.jobs:
+        index = load_job_index(args.jobs)
+        if args.save_index:
+            index.save(args.save_index)
+        if args.resume:
+            print(json.dumps(index.search(read_text_file(args.resume), k=args.k), indent=2))
+        return 0
+    if args.resumes and args.job_file:
+        paths = sorted(
+            os.path.join(args.resumes, n) for n in os.listdir(args.resumes) if n.endswith(".md")
+        )
+        index = index_resumes(paths)
+        print(json.dumps(index.search(read_text_file(args.job_file), k=args.k), indent=2))
+        return 0
+    ap.error("use --jobs [--resume] or --resumes with --job-file")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -26,19 +26,104 @@ Environment variables (set by GitHub Actions):
 - ENV                 (required) : beta | prod
 - COMMIT_SHA          (required)
 - MODEL_ID            (required) : Bedrock model ID
+- MODEL_ROUTES        (optional) : JSON {prompt kind: model ID or [model ID, ...]}
+                                   per kind (html, ats, combined), each list a
+                                   fallback chain tried before the deterministic
+                                   path; kinds left out use MODEL_ID
+- BEDROCK_PARALLEL    (optional) : "1" issues the HTML and ATS calls concurrently
+- BEDROCK_STREAM      (optional) : "1" streams the HTML response into S3 as it
+                                   is generated (invoke_model_with_response_stream)
+- STREAM_FALLBACK     (optional) : "1" streams the fallback page from the
+                                   full resume.md into S3 (multipart when large)
+- RENDER_CACHE        (optional) : local path or s3://bucket/key for the
+                                   block-level fallback render cache
+- RESPONSE_CACHE      (optional) : directory, s3://bucket/prefix or
+                                   dynamodb://table caching raw Bedrock responses
+- RESPONSE_CACHE_TTL  (optional) : entry lifetime in seconds (default 604800)
+- RESPONSE_CACHE_MAX_ENTRIES (optional) : LRU size limit (default 100, 0 = none)
+- RESPONSE_CACHE_EVICT_EVERY (optional) : sweep the cache for eviction on about
+                                   one write in N (default max_entries / 10)
+- BEDROCK_RPM / BEDROCK_TPM (optional) : client-side pacing to the Bedrock
+                                   requests/tokens-per-minute quota (0 = off)
+- BEDROCK_RETRY_MATRIX (optional) : JSON {error class: [retries, base s, max s]}
+                                   merged over RETRY_MATRIX
+- BEDROCK_ATS_TOOL    (optional) : "1" gets the split-mode ATS analytics as a
+                                   tool call (typed input) instead of JSON text
+- BEDROCK_PROMPT_MODE (optional) : "split" (default, one call each for HTML and
+                                   ATS) or "combined" (both from a single call)
+- BEDROCK_MAX_INPUT_TOKENS (optional) : estimated-token budget for the resume in
+                                   prompts, trimmed at section/item boundaries
+                                   (default 3500)
+- BEDROCK_MAX_OUTPUT_TOKENS (optional) : cap for the sized max_tokens (default 4096)
+- BEDROCK_MAX_CONTINUATIONS (optional) : follow-up requests allowed when output
+                                   stops at max_tokens (default 2)
+- BEDROCK_CONTINUATION_MAX_TOKENS / BEDROCK_CONTINUATION_MAX_SECONDS (optional) :
+                                   output-token and wall-time bounds for an answer
+                                   and its continuations (default 12000 / 90)
+- BEDROCK_DEADLINE    (optional) : seconds to wait for Bedrock before publishing
+                                   the precomputed deterministic result (0 = off)
+- BEDROCK_LATE_REPLACE (optional) : "1" uploads a late Bedrock result over the
+                                   fallback (waits up to BEDROCK_LATE_MAX_SECONDS,
+                                   default 120)
+- RUN_DEADLINE        (optional) : seconds for the whole run (0 = off), split
+                                   over the render/analyze/upload/record stages
+                                   (later stages' shares are reserved); time left
+                                   caps AWS timeouts and Bedrock retries, and a
+                                   stage that runs out is skipped or falls back
+- RUN_STAGE_BUDGETS   (optional) : JSON {stage: seconds} overriding the default
+                                   shares of RUN_DEADLINE
+- BEDROCK_HEDGE_REGIONS (optional) : comma-separated secondary Bedrock regions
+                                   to hedge slow or failing calls to
+- BEDROCK_HEDGE_DELAY (optional) : hedge delay in seconds until there is p95
+                                   latency history (default 10)
+- BEDROCK_LATENCY_STATS (optional) : local path or s3://bucket/key persisting
+                                   per-region latency samples for the p95
+- CIRCUIT_BREAKER     (optional) : local JSON file or dynamodb://table holding
+                                   the Bedrock circuit breaker state
+- CIRCUIT_FAILURE_THRESHOLD (optional) : consecutive fallbacks that open it (3)
+- CIRCUIT_OPEN_SECONDS (optional) : time before a half-open probe (default 900)
+- SECTION_ALIASES     (optional) : JSON {section: [heading regex, ...]} merged
+                                   over the default ATS section aliases
+- JOB_INDEX           (optional) : JSONL job postings or saved index (.json);
+                                   top matches are added to ResumeAnalytics
+- JOB_MATCH_TOP       (optional) : number of job matches to record (default 5)
+- AWS_MAX_POOL_CONNECTIONS (optional) : HTTP pool size per AWS client (default 10)
+- AWS_TCP_KEEPALIVE   (optional) : "0" disables TCP keep-alive on AWS clients
 """
 
+import functools
+import hashlib
+import heapq
 import json
 import os
+import random
 import re
 import sys
+import threading
 import time
 import uuid
+from collections import Counter
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    FIRST_EXCEPTION,
+    CancelledError,
+    Future,
+    wait,
+)
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import boto3
-from botocore.exceptions import ClientError
+from botocore.config import Config
+from botocore.exceptions import (
+    ClientError,
+    ConnectionClosedError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    ReadTimeoutError,
+)
 
 
 # ----------------------------
@@ -101,74 +186,509 @@ def build_tracking_script(views_api_url: str) -> str:
 
 
 # ----------------------------
-# Inline markdown renderer
+# AWS clients
 # ----------------------------
-def render_inline(text: str) -> str:
+_AWS_HANDLES: Dict[Tuple[str, str, str, Optional[int]], Any] = {}
+_AWS_HANDLE_STATS = {"created": 0, "reused": 0}
+_AWS_HANDLE_LOCK = threading.Lock()
+
+
+_TIMEOUT_STEPS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30)
+
+
+def _aws_config(service: str, timeout: Optional[float] = None) -> Config:
     """
-    Convert inline markdown (bold, italic, code) to HTML after escaping.
+    Shared botocore config: AWS_MAX_POOL_CONNECTIONS (default 10) sizes the
+    per-client connection pool, AWS_TCP_KEEPALIVE (default on) keeps idle
+    connections alive between calls. timeout caps connect/read timeouts.
+    bedrock-runtime gets no botocore retries: _bedrock_call's RetryPolicy
+    is the only retry layer, so every attempt passes the rate limiter and
+    the deadline check. Other services keep botocore's retries.
     """
-    text = (
-        text.replace("&", "&amp;")
-            .replace("<", "&lt;")
-            .replace(">", "&gt;")
-            .replace('"', "&quot;")
-            .replace("'", "&#39;")
+    config = Config(
+        max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "10")),
+        tcp_keepalive=os.getenv("AWS_TCP_KEEPALIVE", "1").lower() not in ("0", "false"),
     )
-    text = re.sub(r"\*\*\*(.*?)\*\*\*", r"<strong><em>\1</em></strong>", text)
-    text = re.sub(r"___(.*?)___", r"<strong><em>\1</em></strong>", text)
-    text = re.sub(r"\*\*(.*?)\*\*", r"<strong>\1</strong>", text)
-    text = re.sub(r"__(.*?)__", r"<strong>\1</strong>", text)
-    text = re.sub(r"\*(.*?)\*", r"<em>\1</em>", text)
-    text = re.sub(r"_(.*?)_", r"<em>\1</em>", text)
-    text = re.sub(r"`([^`]+)`", r"<code>\1</code>", text)
-    return text
+    if service == "bedrock-runtime":
+        config = config.merge(Config(retries={"total_max_attempts": 1}))
+    if timeout is not None:
+        config = config.merge(Config(connect_timeout=min(timeout, 5), read_timeout=timeout))
+    return config
 
 
-def md_to_basic_html(md: str, views_api_url: str = "") -> str:
+def _timeout_step(seconds: Optional[float]) -> Optional[float]:
     """
-    Deterministic ATS-friendly HTML renderer. No external dependencies.
-    Handles: h1/h2/h3, ul/li, hr, bold, italic, inline code, paragraphs.
-    Injects view tracking script if views_api_url is provided.
+    Round a remaining-time budget down to a few fixed steps, so deadline-
+    bound calls share a handful of clients instead of one per call. Never
+    more than seconds: DeadlineExceeded below the smallest step. None
+    (botocore's 60 s defaults) past 60 s.
+    """
+    if seconds is None or seconds > 60:
+        return None
+    fitting = [s for s in _TIMEOUT_STEPS if s <= seconds]
+    if not fitting:
+        raise DeadlineExceeded(f"{seconds:.2f}s left is too short for an AWS call")
+    return fitting[-1]
+
+
+def _aws_handle(kind: str, service: str, region: str, timeout: Optional[float] = None) -> Any:
+    step = _timeout_step(timeout)
+    key = (kind, service, region, step)
+    with _AWS_HANDLE_LOCK:
+        handle = _AWS_HANDLES.get(key)
+        if handle is not None:
+            _AWS_HANDLE_STATS["reused"] += 1
+            return handle
+        factory = boto3.client if kind == "client" else boto3.resource
+        handle = factory(service, region_name=region, config=_aws_config(service, step))
+        _AWS_HANDLES[key] = handle
+        _AWS_HANDLE_STATS["created"] += 1
+        return handle
+
+
+def aws_client(service: str, region: str, timeout: Optional[float] = None) -> Any:
+    """
+    Process-wide boto3 client per (service, region), so credential
+    resolution, endpoint loading and TLS setup happen once per process.
+    Clients are thread-safe and may be shared. timeout (seconds left in
+    the caller's budget) selects a client with connect/read timeouts no
+    longer than that.
+    """
+    return _aws_handle("client", service, region, timeout)
+
+
+def aws_resource(service: str, region: str, timeout: Optional[float] = None) -> Any:
+    """Process-wide boto3 resource per (service, region); not thread-safe."""
+    return _aws_handle("resource", service, region, timeout)
+
+
+def aws_client_stats() -> Dict[str, int]:
+    with _AWS_HANDLE_LOCK:
+        return dict(_AWS_HANDLE_STATS)
+
+
+# ----------------------------
+# Run deadline & stage budgets
+# ----------------------------
+class DeadlineExceeded(RuntimeError):
+    """A stage (or Bedrock under BEDROCK_DEADLINE) ran out of time."""
+
+
+RUN_STAGES = ("render", "analyze", "upload", "record")
+# Share of RUN_DEADLINE per stage; render covers both Bedrock calls.
+DEFAULT_STAGE_SHARES = {"render": 0.6, "analyze": 0.1, "upload": 0.15, "record": 0.15}
+
+
+def remaining_timeout(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until a time.monotonic() deadline; None if unbounded."""
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("stage time budget exhausted")
+    return left
+
+
+class RunBudget:
     """
-    lines = [ln.rstrip() for ln in md.splitlines()]
-    html_parts: List[str] = []
-    in_ul = False
+    Run-level deadline split into per-stage budgets. begin(stage) returns
+    the stage's absolute deadline for passing down as timeouts: its budget
+    from now, but never into the budgets reserved for the stages after it
+    (so a slow render cannot eat the upload and record time). end(stage)
+    books the time spent; exceeded(stage) notes a stage that ran out.
+    total=0 disables all deadlines but still times the stages.
+    """
+
+    def __init__(self, total: float = 0, budgets: Optional[Dict[str, float]] = None) -> None:
+        self.total = total
+        self.started = time.monotonic()
+        if budgets is None:
+            budgets = {stage: total * share for stage, share in DEFAULT_STAGE_SHARES.items()} if total else {}
+        self.budgets = budgets
+        self.spent: Dict[str, float] = {}
+        self.overrun: List[str] = []
+        self._open: Dict[str, float] = {}
+
+    @classmethod
+    def from_env(cls, total: str, budgets: str) -> "RunBudget":
+        """RUN_DEADLINE seconds; RUN_STAGE_BUDGETS JSON {stage: seconds} overrides shares."""
+        seconds = float(total or 0)
+        if not budgets.strip():
+            return cls(seconds)
+        parsed = {str(k): float(v) for k, v in json.loads(budgets).items()}
+        unknown = set(parsed) - set(RUN_STAGES)
+        if unknown:
+            raise RuntimeError(f"RUN_STAGE_BUDGETS has unknown stages: {sorted(unknown)}")
+        defaults = {stage: seconds * share for stage, share in DEFAULT_STAGE_SHARES.items()}
+        return cls(seconds, {**defaults, **parsed})
+
+    def begin(self, stage: str) -> Optional[float]:
+        now = time.monotonic()
+        self._open[stage] = now
+        limits = []
+        if stage in self.budgets and self.budgets[stage] > 0:
+            limits.append(now + self.budgets[stage])
+        if self.total:
+            later = RUN_STAGES[RUN_STAGES.index(stage) + 1:]
+            reserved = sum(max(0.0, self.budgets.get(s, 0.0)) for s in later)
+            limits.append(self.started + self.total - reserved)
+        return min(limits) if limits else None
+
+    def exceeded(self, stage: str) -> None:
+        if stage not in self.overrun:
+            self.overrun.append(stage)
+
+    def end(self, stage: str) -> None:
+        start = self._open.pop(stage, None)
+        if start is not None:
+            self.spent[stage] = self.spent.get(stage, 0.0) + time.monotonic() - start
+
+    def report(self) -> Dict[str, Any]:
+        stages = {
+            stage: {
+                "spent_s": round(self.spent.get(stage, 0.0), 3),
+                "budget_s": round(self.budgets[stage], 3) if stage in self.budgets else None,
+            }
+            for stage in RUN_STAGES
+        }
+        return {
+            "deadline_s": self.total or None,
+            "elapsed_s": round(time.monotonic() - self.started, 3),
+            "stages": stages,
+            "exceeded": self.overrun,
+        }
 
-    def close_ul():
-        nonlocal in_ul
-        if in_ul:
-            html_parts.append("</ul>")
-            in_ul = False
 
-    for ln in lines:
-        if re.match(r"^\s*[-*]{3,}\s*$", ln):
-            close_ul()
-            html_parts.append("<hr>")
+# ----------------------------
+# Inline markdown renderer
+# ----------------------------
+_HTML_ESCAPES = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#39;",
+})
+
+_INLINE_DELIMITERS = re.compile(r"[*_`\n]")
+
+# Opening/closing tags by delimiter run width for the * and _ families.
+_EMPHASIS_TAGS = {
+    3: ("<strong><em>", "</em></strong>"),
+    2: ("<strong>", "</strong>"),
+    1: ("<em>", "</em>"),
+}
+
+
+def _pair_emphasis(positions: List[int], marks: Dict[int, str], max_width: int) -> None:
+    """
+    Pair one emphasis delimiter family (* or _) within a single line.
+
+    Widths are resolved 3, 2, 1 in that order, each leftmost-first and
+    non-overlapping, which is what the old chained re.sub passes did.
+    Two unpaired delimiters are only "adjacent" if they were adjacent in
+    the source, since paired ones turn into tags. Once an opener finds no
+    closer, no later opener can either, so every width is a single walk.
+    Widths above max_width are skipped (no run that long in the text).
+    """
+    free = positions
+    for width in (3, 2):
+        if width > max_width or len(free) < 2 * width:
             continue
-        if not ln.strip():
-            close_ul()
+        open_tag, close_tag = _EMPHASIS_TAGS[width]
+        consumed = set()
+        opener = -1
+        cursor = 0
+        run = 0
+        for idx, pos in enumerate(free):
+            run = run + 1 if idx and free[idx - 1] == pos - 1 else 1
+            if run < width:
+                continue
+            start = pos - width + 1
+            if opener < 0:
+                if start >= cursor:
+                    opener = start
+            elif start >= opener + width:
+                marks[opener] = open_tag
+                marks[start] = close_tag
+                for off in range(1, width):
+                    marks[opener + off] = ""
+                    marks[start + off] = ""
+                consumed.update(range(opener, opener + width))
+                consumed.update(range(start, start + width))
+                cursor = start + width
+                opener = -1
+        if consumed:
+            free = [p for p in free if p not in consumed]
+
+    # Width 1 always pairs consecutive survivors: an odd one out is unmatched.
+    end = len(free) & ~1
+    if end:
+        marks.update(dict.fromkeys(free[0:end:2], "<em>"))
+        marks.update(dict.fromkeys(free[1:end:2], "</em>"))
+
+
+def _run_width(text: str, ch: str) -> int:
+    if ch * 3 in text:
+        return 3
+    return 2 if ch * 2 in text else 1
+
+
+def render_inline(text: str) -> str:
+    """
+    Convert inline markdown (bold, italic, code) to HTML after escaping.
+
+    Single scan: one regex pass collects the *, _ and ` positions, the
+    delimiters are paired on those positions alone, and the text between
+    them is escaped with str.translate while the output is assembled.
+    Worst case is O(n + d) for n characters and d delimiters, including
+    lines full of unmatched * or _ (snake_case identifiers, URLs).
+    """
+    found = [m.start() for m in _INLINE_DELIMITERS.finditer(text)]
+    if not found:
+        return text.translate(_HTML_ESCAPES)
+
+    star_width = _run_width(text, "*")
+    under_width = _run_width(text, "_")
+    marks: Dict[int, str] = {}
+    stars: List[int] = []
+    unders: List[int] = []
+    ticks: List[int] = []
+    for pos in found:
+        ch = text[pos]
+        if ch == "*":
+            stars.append(pos)
+        elif ch == "_":
+            unders.append(pos)
+        elif ch == "`":
+            ticks.append(pos)
+        else:
+            # '.' never matched a newline in the old patterns; `[^`]` did.
+            _pair_emphasis(stars, marks, star_width)
+            _pair_emphasis(unders, marks, under_width)
+            stars, unders = [], []
+    _pair_emphasis(stars, marks, star_width)
+    _pair_emphasis(unders, marks, under_width)
+
+    # Inline code: a backtick, at least one non-backtick, a backtick.
+    i = 0
+    while i + 1 < len(ticks):
+        if ticks[i + 1] > ticks[i] + 1:
+            marks[ticks[i]] = "<code>"
+            marks[ticks[i + 1]] = "</code>"
+            i += 2
+        else:
+            i += 1
+
+    if not marks:
+        return text.translate(_HTML_ESCAPES)
+    out: List[str] = []
+    last = 0
+    for pos in found:
+        tag = marks.get(pos)
+        if tag is None:
             continue
-        if ln.startswith("# "):
-            close_ul()
-            html_parts.append(f"<h1>{render_inline(ln[2:].strip())}</h1>")
-        elif ln.startswith("## "):
-            close_ul()
-            html_parts.append(f"<h2>{render_inline(ln[3:].strip())}</h2>")
-        elif ln.startswith("### "):
-            close_ul()
-            html_parts.append(f"<h3>{render_inline(ln[4:].strip())}</h3>")
-        elif ln.startswith("- ") or ln.startswith("* "):
-            if not in_ul:
-                html_parts.append("<ul>")
-                in_ul = True
-            html_parts.append(f"<li>{render_inline(ln[2:].strip())}</li>")
+        out.append(text[last:pos].translate(_HTML_ESCAPES))
+        out.append(tag)
+        last = pos + 1
+    out.append(text[last:].translate(_HTML_ESCAPES))
+    return "".join(out)
+
+
+# ----------------------------
+# Block-level document model
+# ----------------------------
+class Heading:
+    __slots__ = ("level", "text")
+
+    def __init__(self, level: int, text: str) -> None:
+        self.level = level
+        self.text = text
+
+
+class BulletList:
+    __slots__ = ("items",)
+
+    def __init__(self, items: List[str]) -> None:
+        self.items = items
+
+
+class Paragraph:
+    __slots__ = ("text",)
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+class Rule:
+    __slots__ = ()
+
+
+class Document:
+    """
+    Parsed resume.md: an ordered list of Heading, BulletList, Paragraph
+    and Rule blocks. Built once by parse_markdown and shared by the
+    deterministic renderer and the ATS analysis.
+    """
+
+    __slots__ = ("blocks",)
+
+    def __init__(self, blocks: List[Any]) -> None:
+        self.blocks = blocks
+
+    def texts(self) -> Iterator[str]:
+        """Yield every block's source text (markers stripped) in order."""
+        for block in self.blocks:
+            if isinstance(block, BulletList):
+                yield from block.items
+            elif not isinstance(block, Rule):
+                yield block.text
+
+
+_RULE_RE = re.compile(r"^\s*[-*]{3,}\s*$")
+_HEADING_PREFIXES = (("# ", 1), ("## ", 2), ("### ", 3))
+
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[Any]:
+    """
+    Yield blocks from an iterable of lines (a file object works). Lines
+    are re-split with str.splitlines so the result matches parsing the
+    whole text. A BulletList is yielded once the line after it ends it.
+    """
+    bullets: Optional[BulletList] = None
+
+    for raw in lines:
+        for ln in raw.splitlines() or [""]:
+            ln = ln.rstrip()
+            is_item = ln.startswith("- ") or ln.startswith("* ")
+            if bullets is not None and not is_item:
+                yield bullets
+                bullets = None
+            if not ln:
+                continue
+            if _RULE_RE.match(ln):
+                yield Rule()
+                continue
+            if is_item:
+                if bullets is None:
+                    bullets = BulletList([])
+                bullets.items.append(ln[2:].strip())
+                continue
+            for prefix, level in _HEADING_PREFIXES:
+                if ln.startswith(prefix):
+                    yield Heading(level, ln[len(prefix):].strip())
+                    break
+            else:
+                yield Paragraph(ln.strip())
+
+    if bullets is not None:
+        yield bullets
+
+
+def parse_markdown(md: str) -> Document:
+    """
+    Single pass over the lines of md. Consecutive list lines share one
+    BulletList; blank lines, rules and any other block end it.
+    """
+    return Document(list(iter_blocks(md.splitlines())))
+
+
+def render_block(block: Any) -> str:
+    if isinstance(block, Heading):
+        return f"<h{block.level}>{render_inline(block.text)}</h{block.level}>"
+    if isinstance(block, BulletList):
+        lis = "".join(f"<li>{render_inline(t)}</li>" for t in block.items)
+        return f"<ul>{lis}</ul>"
+    if isinstance(block, Paragraph):
+        return f"<p>{render_inline(block.text)}</p>"
+    return "<hr>"
+
+
+# ----------------------------
+# Incremental render cache
+# ----------------------------
+RENDER_CACHE_VERSION = "1"  # bump when render_block/render_inline output changes
+
+
+def _block_key(block: Any) -> str:
+    if isinstance(block, Heading):
+        sig = f"h{block.level}\0{block.text}"
+    elif isinstance(block, BulletList):
+        sig = "ul\0" + "\0".join(block.items)
+    elif isinstance(block, Paragraph):
+        sig = f"p\0{block.text}"
+    else:
+        sig = "hr"
+    return hashlib.sha256(sig.encode("utf-8")).hexdigest()
+
+
+class BlockRenderCache:
+    """
+    Rendered HTML fragments keyed by a SHA-256 of each block's content.
+    Unchanged blocks are served from the cache; only dirty ones go through
+    render_inline. Persisted as JSON to a local path or s3://bucket/key.
+    Only fragments used in this run are saved, so stale blocks age out.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, str]] = None) -> None:
+        self.entries = entries or {}
+        self.used: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, block: Any) -> str:
+        key = _block_key(block)
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            html = render_block(block)
+        else:
+            self.hits += 1
+        self.used[key] = html
+        return html
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    @classmethod
+    def load(cls, location: str, region: str) -> "BlockRenderCache":
+        try:
+            if location.startswith("s3://"):
+                bucket, _, key = location[5:].partition("/")
+                obj = aws_client("s3", region).get_object(Bucket=bucket, Key=key)
+                raw = obj["Body"].read().decode("utf-8")
+            elif os.path.exists(location):
+                raw = read_text_file(location)
+            else:
+                return cls()
+            data = json.loads(raw)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                print(f"WARN: render cache load failed ({e}); rendering cold.", file=sys.stderr)
+            return cls()
+        except (OSError, ValueError) as e:
+            print(f"WARN: render cache unreadable ({e}); rendering cold.", file=sys.stderr)
+            return cls()
+        if data.get("version") != RENDER_CACHE_VERSION:
+            return cls()
+        return cls(data.get("entries") or {})
+
+    def save(self, location: str, region: str) -> None:
+        body = json.dumps({"version": RENDER_CACHE_VERSION, "entries": self.used})
+        if location.startswith("s3://"):
+            bucket, _, key = location[5:].partition("/")
+            aws_client("s3", region).put_object(
+                Bucket=bucket,
+                Key=key,
+                Body=body.encode("utf-8"),
+                ContentType="application/json",
+            )
         else:
-            close_ul()
-            html_parts.append(f"<p>{render_inline(ln.strip())}</p>")
+            with open(location, "w", encoding="utf-8") as f:
+                f.write(body)
 
-    close_ul()
 
-    css = """
+_BASIC_CSS = """
     body { font-family: Arial, sans-serif; margin: 40px auto; color: #111; max-width: 860px; padding: 0 20px; }
     h1 { font-size: 26px; margin: 0 0 4px; }
     h2 { font-size: 16px; margin: 20px 0 4px; border-bottom: 1px solid #ccc; padding-bottom: 2px; text-transform: uppercase; letter-spacing: 0.05em; }
@@ -181,14 +701,63 @@ def md_to_basic_html(md: str, views_api_url: str = "") -> str:
     strong { font-weight: 600; }
     """
 
+_BASIC_HTML_HEAD = (
+    "<!doctype html><html lang='en'><head><meta charset='utf-8'>"
+    "<meta name='viewport' content='width=device-width, initial-scale=1'>"
+    f"<title>Will Soto | AWS Cloud Engineer</title><style>{_BASIC_CSS}</style></head>"
+    "<body>"
+)
+
+
+def _basic_html_tail(views_api_url: str) -> str:
     tracking = build_tracking_script(views_api_url) if views_api_url else ""
+    return f"{tracking}</body></html>"
 
-    return (
-        "<!doctype html><html lang='en'><head><meta charset='utf-8'>"
-        "<meta name='viewport' content='width=device-width, initial-scale=1'>"
-        f"<title>Will Soto | AWS Cloud Engineer</title><style>{css}</style></head>"
-        f"<body>{''.join(html_parts)}{tracking}</body></html>"
-    )
+
+def md_to_basic_html(
+    md: str,
+    views_api_url: str = "",
+    doc: Optional[Document] = None,
+    cache: Optional[BlockRenderCache] = None,
+) -> str:
+    """
+    Deterministic ATS-friendly HTML renderer. No external dependencies.
+    Handles: h1/h2/h3, ul/li, hr, bold, italic, inline code, paragraphs.
+    Injects view tracking script if views_api_url is provided.
+    Pass doc to reuse an already parsed Document instead of md, and cache
+    to reuse fragments for blocks rendered on a previous run.
+    """
+    if doc is None:
+        doc = parse_markdown(md)
+    render = cache.render if cache is not None else render_block
+    html_parts = [render(b) for b in doc.blocks]
+    return f"{_BASIC_HTML_HEAD}{''.join(html_parts)}{_basic_html_tail(views_api_url)}"
+
+
+def iter_basic_html(
+    lines: Iterable[str],
+    views_api_url: str = "",
+    chunk_size: int = 64 * 1024,
+    cache: Optional[BlockRenderCache] = None,
+) -> Iterator[bytes]:
+    """
+    Streaming form of md_to_basic_html: reads lines (e.g. an open
+    resume.md) and yields UTF-8 chunks of roughly chunk_size bytes.
+    Concatenated output is identical to md_to_basic_html on the same
+    text; memory stays bounded by one chunk plus one block.
+    """
+    buf: List[bytes] = [_BASIC_HTML_HEAD.encode("utf-8")]
+    size = len(buf[0])
+    render = cache.render if cache is not None else render_block
+    for block in iter_blocks(lines):
+        part = render(block).encode("utf-8")
+        buf.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield b"".join(buf)
+            buf, size = [], 0
+    buf.append(_basic_html_tail(views_api_url).encode("utf-8"))
+    yield b"".join(buf)
 
 
 def sanitize_html(html: str, views_api_url: str = "") -> str:
@@ -210,46 +779,282 @@ def sanitize_html(html: str, views_api_url: str = "") -> str:
     return html
 
 
+def iter_sanitized_html(chunks: Iterable[str], views_api_url: str = "") -> Iterator[bytes]:
+    """
+    Streaming form of sanitize_html for text that arrives in pieces (a
+    Bedrock response stream). Yields UTF-8 bytes whose concatenation equals
+    sanitize_html("".join(chunks), views_api_url).
+
+    Only what can still change is held back: the first few characters
+    until the opening fence is decided, a trailing run of whitespace and
+    backticks (a possible closing fence), and six characters so a
+    "</body>" split across chunks still gets the tracker.
+    """
+    max_chars = 120000
+    tracking = build_tracking_script(views_api_url) if views_api_url else ""
+    head = ""            # text before the opening fence is decided
+    head_done = False
+    skip_ws = False      # still eating whitespace after an opening fence
+    pending = ""         # trailing whitespace/backticks, maybe a closing fence
+    carry = ""           # tail held back for "</body>" matching
+    emitted = 0          # characters of final (pre-tracker) text so far
+    saw_body = False
+
+    def inject(text: str, final: bool) -> str:
+        nonlocal carry, saw_body
+        buf = carry + text
+        if not tracking:
+            carry = ""
+            return buf
+        cut = len(buf) if final else max(0, len(buf) - 6)
+        tail_hit = buf.rfind("</body>", 0, cut + 6)
+        if tail_hit != -1 and tail_hit + 7 > cut:
+            cut = tail_hit + 7
+        out, carry = buf[:cut], buf[cut:]
+        if "</body>" in out:
+            saw_body = True
+            out = out.replace("</body>", f"{tracking}</body>")
+        return out
+
+    def clamp(text: str) -> str:
+        nonlocal emitted
+        text = text[: max_chars - emitted]
+        emitted += len(text)
+        return text
+
+    def body(text: str) -> Iterator[bytes]:
+        nonlocal pending
+        pending += text
+        idx = len(pending)
+        while idx and (pending[idx - 1].isspace() or pending[idx - 1] == "`"):
+            idx -= 1
+        if idx:
+            ready, pending = pending[:idx], pending[idx:]
+            out = inject(clamp(ready), final=False)
+            if out:
+                yield out.encode("utf-8")
+
+    def open_fence(text: str) -> str:
+        nonlocal skip_ws
+        if text.startswith("```"):
+            text = text[3:]
+            if text[:4].lower() == "html":
+                text = text[4:]
+            skip_ws = True
+        return text
+
+    for chunk in chunks:
+        if not head_done:
+            head = (head + chunk).lstrip()
+            if len(head) < 7:
+                continue
+            head_done = True
+            chunk, head = open_fence(head), ""
+        if skip_ws:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            skip_ws = False
+        yield from body(chunk)
+
+    if not head_done:
+        rest = open_fence(head)
+        if skip_ws:
+            rest = rest.lstrip()
+        yield from body(rest)
+
+    tail = re.sub(r"\s*```$", "", pending.rstrip()).rstrip()
+    if not emitted:
+        tail = tail.lstrip()
+    out = inject(clamp(tail), final=True)
+    if tracking and not saw_body:
+        out += tracking
+    if out:
+        yield out.encode("utf-8")
+
+
 # ----------------------------
 # ATS analytics (deterministic fallback)
 # ----------------------------
-def basic_ats_analysis(md: str) -> Dict[str, Any]:
+# Same tokens as \b\w+\b (a maximal \w run always sits on boundaries), minus
+# the two boundary checks per token.
+_WORD_RE = re.compile(r"\w+")
+
+# Filler that would otherwise crowd out real keywords (words under four
+# letters are dropped anyway).
+KEYWORD_STOPWORDS = frozenset("""
+    about above across after again against along also among around because
+    been before being below between both but during each either from have
+    having here including into itself more most much must onto other over
+    same should some such than that their them then there these they this
+    those through throughout toward towards under until upon using very
+    were what when where which while will with within without would your
+""".split())
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def normalize_term(word: str) -> Optional[str]:
+    """
+    Keyword key for a token: lowercased, light plural stemming (Harman's
+    S-stemmer: -ies -> -y, -es -> -e, -s -> ''). None for tokens under four
+    letters, stopwords and pure numbers. Memoized, since vocabularies are
+    far smaller than token streams.
+    """
+    w = word.lower()
+    if len(w) < 4 or w in KEYWORD_STOPWORDS or w.isdigit():
+        return None
+    if w.endswith("ies") and not w.endswith(("eies", "aies")):
+        return w[:-3] + "y"
+    if w.endswith("es") and not w.endswith(("aes", "ees", "oes")):
+        return w[:-1]
+    if w.endswith("s") and not w.endswith(("us", "ss")):
+        return w[:-1]
+    return w
+
+
+class KeywordCounter:
+    """
+    Streaming keyword counts over one document or a whole corpus. Raw
+    tokens are counted as they stream in; stemming and stopwords are only
+    applied per distinct token when top() is asked for.
+    """
+
+    __slots__ = ("counts", "total")
+
+    def __init__(self) -> None:
+        self.counts: Counter = Counter()
+        self.total = 0
+
+    def update(self, texts: Iterable[str]) -> None:
+        """Tokenize and count each text as it arrives; nothing is joined or kept."""
+        counts = self.counts
+        findall = _WORD_RE.findall
+        for text in texts:
+            words = findall(text)
+            counts.update(words)
+            self.total += len(words)
+
+    def top(self, k: int) -> List[str]:
+        """
+        The k most frequent keyword stems, each shown as its most frequent
+        lowercased surface form. Ties break alphabetically (stem, then
+        surface) so output is stable. Selection is a bounded heap; surface
+        forms are only tallied for the k stems selected.
+        """
+        stems: Dict[str, int] = {}
+        stemmed: List[Tuple[str, str, int]] = []
+        get = stems.get
+        for word, n in self.counts.items():
+            stem = normalize_term(word)
+            if stem is not None:
+                stems[stem] = get(stem, 0) + n
+                stemmed.append((stem, word, n))
+        top = heapq.nsmallest(k, stems.items(), key=lambda kv: (-kv[1], kv[0]))
+
+        surfaces: Dict[str, Counter] = {stem: Counter() for stem, _ in top}
+        for stem, word, n in stemmed:
+            forms = surfaces.get(stem)
+            if forms is not None:
+                forms[word.lower()] += n
+        return [
+            min(surfaces[stem].items(), key=lambda kv: (-kv[1], kv[0]))[0]
+            for stem, _ in top
+        ]
+
+
+# Canonical section name -> regexes that may open a level-2 heading for it.
+SECTION_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "Summary": (r"(?:professional\s+)?summary",),
+    "Skills": (r"skills",),
+    "Projects": (r"projects",),
+    "Experience": (r"experience",),
+    "Education": (r"education",),
+    "Certifications": (r"certifications?",),
+}
+
+
+def compile_section_aliases(aliases: Dict[str, Tuple[str, ...]]) -> Tuple[Any, List[str]]:
+    """
+    Fold an alias table into one case-insensitive pattern, one named group
+    per canonical section, so each heading is matched exactly once.
+    Returns (pattern, canonical names in table order).
+    """
+    names = list(aliases)
+    groups = "|".join(
+        f"(?P<s{i}>{'|'.join(f'(?:{a})' for a in aliases[name])})"
+        for i, name in enumerate(names)
+    )
+    return re.compile(rf"(?:{groups})\b", re.IGNORECASE), names
+
+
+_SECTION_PATTERN = compile_section_aliases(SECTION_ALIASES)
+
+
+def load_section_aliases(raw: str) -> Optional[Dict[str, Tuple[str, ...]]]:
+    """
+    Parse a JSON object of {canonical: [regex, ...]} layered over
+    SECTION_ALIASES, e.g. '{"Certifications": ["certifications?", "licenses"]}'.
+    Empty input means the defaults (None).
+    """
+    if not raw.strip():
+        return None
+    extra = json.loads(raw)
+    if not isinstance(extra, dict):
+        raise ValueError("SECTION_ALIASES must be a JSON object")
+    merged = dict(SECTION_ALIASES)
+    merged.update({str(k): tuple(str(a) for a in v) for k, v in extra.items()})
+    return merged
+
+
+def basic_ats_analysis(
+    md: str,
+    doc: Optional[Document] = None,
+    aliases: Optional[Dict[str, Tuple[str, ...]]] = None,
+) -> Dict[str, Any]:
     """
     Deterministic ATS scoring for fallback path.
     Matches both '## Summary' and '## PROFESSIONAL SUMMARY' so Summary
     is never incorrectly flagged as missing.
+    Pass doc to reuse an already parsed Document instead of md, and
+    aliases to override SECTION_ALIASES.
     """
-    words = re.findall(r"\b\w+\b", md)
-    word_count = len(words)
+    return ats_from_blocks((doc or parse_markdown(md)).blocks, aliases)
 
-    def has_section(name: str) -> bool:
-        return bool(re.search(rf"(?im)^##\s+{re.escape(name)}\b", md))
 
-    sections = {
-        "Summary": bool(re.search(r"(?im)^##\s+(professional\s+)?summary\b", md)),
-        "Skills": has_section("Skills"),
-        "Projects": has_section("Projects"),
-        "Experience": has_section("Experience"),
-        "Education": has_section("Education"),
-        "Certifications": bool(re.search(r"(?im)^##\s+Certifications?\b", md)),
-    }
+def ats_from_blocks(
+    blocks: Iterable[Any],
+    aliases: Optional[Dict[str, Tuple[str, ...]]] = None,
+) -> Dict[str, Any]:
+    """
+    basic_ats_analysis in one pass over a block stream, e.g.
+    iter_blocks(file): only keyword counts are kept, not the document.
+    """
+    pattern, names = _SECTION_PATTERN if aliases is None else compile_section_aliases(aliases)
+    counter = KeywordCounter()
+    found = set()
+    for block in blocks:
+        if isinstance(block, BulletList):
+            counter.update(block.items)
+        elif not isinstance(block, Rule):
+            counter.update((block.text,))
+            if isinstance(block, Heading) and block.level == 2:
+                m = pattern.match(block.text)
+                if m:
+                    found.add(names[int(m.lastgroup[1:])])
+    word_count = counter.total
+
+    sections = {name: name in found for name in (aliases or SECTION_ALIASES)}
     missing_sections = [k for k, v in sections.items() if not v]
 
     score = 60
     score += 10 if word_count >= 350 else -5
-    score += 10 if sections["Skills"] else -10
-    score += 10 if sections["Experience"] else -10
-    score += 5 if sections["Projects"] else -5
+    score += 10 if "Skills" in found else -10
+    score += 10 if "Experience" in found else -10
+    score += 5 if "Projects" in found else -5
     score -= min(15, 3 * len(missing_sections))
     score = max(0, min(100, score))
 
-    freq: Dict[str, int] = {}
-    for w in words:
-        w2 = w.lower()
-        if len(w2) < 4:
-            continue
-        freq[w2] = freq.get(w2, 0) + 1
-    keywords = sorted(freq.keys(), key=lambda k: freq[k], reverse=True)[:15]
+    keywords = counter.top(15)
 
     return {
         "word_count": int(word_count),
@@ -274,9 +1079,777 @@ def validate_analytics(obj: Dict[str, Any]) -> Dict[str, Any]:
     return obj
 
 
+# ----------------------------
+# Token budgeting
+# ----------------------------
+_TOKEN_PIECE_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+# prompt kind -> (output tokens per resume input token, fixed output tokens)
+OUTPUT_BUDGETS: Dict[str, Tuple[float, int]] = {
+    "html": (2.2, 400),  # markup roughly doubles the markdown
+    "ats": (0.0, 350),  # fixed-size JSON
+    "combined": (2.2, 750),
+}
+
+
+def _piece_tokens(piece: str) -> int:
+    if piece[0].isalpha():
+        return 1 + (len(piece) - 1) // 5
+    if piece[0].isdigit():
+        return 1 + (len(piece) - 1) // 3
+    return 1
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local approximation of Claude's tokenizer: a token per ~5 letters of a
+    word, per ~3 digits and per punctuation character. Within ~10% on
+    English resumes (about 3.6 characters per token); no network call.
+    """
+    return sum(_piece_tokens(piece) for piece in _TOKEN_PIECE_RE.findall(text))
+
+
+def size_max_tokens(kind: str, input_tokens: int, cap: int = 4096) -> int:
+    """max_tokens for a prompt kind from the resume's estimated token count."""
+    ratio, fixed = OUTPUT_BUDGETS[kind]
+    return min(cap, int(input_tokens * ratio) + fixed)
+
+
+def _resume_units(md: str) -> List[List[Tuple[str, int, bool]]]:
+    """
+    Sections (split at "## " headings) of units (text, tokens, pinned). A
+    unit is a heading, a bullet, a rule or a paragraph with its trailing
+    blank lines, so trimming never cuts a sentence. Only headings are
+    pinned; the preamble before the first section is trimmed like any
+    other section once it is the largest.
+    """
+    sections: List[List[List[Any]]] = [[]]
+    for line in md.splitlines(keepends=True):
+        stripped = line.strip()
+        units = sections[-1]
+        if line.startswith("## "):
+            sections.append([[line, True]])
+        elif not stripped:
+            if units:
+                units[-1][0] += line
+            else:
+                units.append([line, False])
+        elif (
+            not units
+            or line.startswith(("#", "- ", "* "))
+            or _RULE_RE.match(line)
+            or not units[-1][0].strip()
+            or units[-1][0].endswith(("\n\n", "\r\n\r\n"))
+            or units[-1][0].startswith(("#", "- ", "* "))
+        ):
+            units.append([line, line.startswith("#")])
+        else:
+            units[-1][0] += line
+    return [[(text, estimate_tokens(text), pinned) for text, pinned in units] for units in sections]
+
+
+def cut_at_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text whose estimate_tokens is at most max_tokens."""
+    n = 0
+    for m in _TOKEN_PIECE_RE.finditer(text):
+        n += _piece_tokens(m.group(0))
+        if n > max_tokens:
+            return text[:m.start()]
+    return text
+
+
+_UNIT_BREAK_RE = re.compile(r"\n|[.!?;](?=\s)")
+
+
+def cut_unit(text: str, max_tokens: int) -> str:
+    """
+    text cut to at most max_tokens at its last line or sentence break
+    that fits (the last word break if none does), ending in a blank line
+    like a whole unit. "" when not even one word fits.
+    """
+    cut = cut_at_tokens(text, max_tokens)
+    ends = [m.end() for m in _UNIT_BREAK_RE.finditer(cut)]
+    if ends:
+        cut = cut[:ends[-1]]
+    elif cut != text and not text[len(cut)].isspace():
+        cut = cut[:max(cut.rfind(" "), 0)]
+    cut = cut.rstrip()
+    return cut + "\n\n" if cut else ""
+
+
+def fit_resume(md: str, max_tokens: int) -> Tuple[str, Dict[str, Any]]:
+    """
+    Trim md to about max_tokens estimated tokens at unit boundaries,
+    always from the tail of whichever section is currently largest. All
+    headings survive, so no section looks missing to the model. A
+    section's last body unit, when larger than what is left to trim, is
+    cut at its last line or sentence break within the budget instead of
+    dropped; if the pinned headings
+    alone still exceed the budget, the text is cut at the last line break
+    within it. Either sets report["hard_cut"]. Returns (text, report).
+    """
+    total = estimate_tokens(md)
+    report: Dict[str, Any] = {
+        "estimated_tokens": total,
+        "max_tokens": max_tokens,
+        "trimmed_sections": [],
+        "hard_cut": False,
+    }
+    if total <= max_tokens:
+        report["kept_tokens"] = total
+        return md, report
+
+    sections = _resume_units(md)
+    kept = [len(units) for units in sections]
+    body = [sum(t for _, t, pinned in units if not pinned) for units in sections]
+    total = sum(t for units in sections for _, t, _ in units)
+    heap = [(-cost, i) for i, cost in enumerate(body) if cost]
+    heapq.heapify(heap)
+    trimmed = set()
+    while total > max_tokens and heap:
+        _, i = heapq.heappop(heap)
+        units = sections[i]
+        j = kept[i] - 1
+        while j >= 0 and units[j][2]:
+            j -= 1
+        if j < 0:
+            continue
+        trimmed.add(i)
+        unit, cost, _ = units[j]
+        if cost > total - max_tokens and all(pinned for _, _, pinned in units[:j]):
+            # The section's last body unit, and dropping it would overshoot
+            # (one long paragraph, a heading-less resume): keep what fits.
+            head = cut_unit(unit, cost - (total - max_tokens))
+            if head:
+                head_cost = estimate_tokens(head)
+                total -= cost - head_cost
+                sections[i] = units[:j] + [(head, head_cost, False)] + units[j + 1:]
+                report["hard_cut"] = True
+                break
+        # Drop unit j; keep anything pinned after it (e.g. a later ### heading).
+        total -= cost
+        body[i] -= cost
+        sections[i] = units[:j] + units[j + 1:]
+        kept[i] -= 1
+        if body[i]:
+            heapq.heappush(heap, (-body[i], i))
+
+    text = "".join(unit for units in sections for unit, _, _ in units)
+    kept_tokens = estimate_tokens(text)
+    if kept_tokens > max_tokens:
+        cut = cut_at_tokens(text, max_tokens)
+        line_end = cut.rfind("\n")
+        text = cut[:line_end + 1] if line_end > 0 else cut
+        kept_tokens = estimate_tokens(text)
+        report["hard_cut"] = True
+    report["kept_tokens"] = kept_tokens
+    report["trimmed_sections"] = [
+        sections[i][0][0].strip() if i else "(preamble)" for i in sorted(trimmed)
+    ]
+    return text, report
+
+
+# ----------------------------
+# Bedrock retry policy & rate limiting
+# ----------------------------
+# error class -> (retries, base delay s, max delay s)
+RETRY_MATRIX: Dict[str, Tuple[int, float, float]] = {
+    "throttling": (4, 1.0, 20.0),
+    "transient": (2, 0.5, 8.0),
+    "unknown": (1, 2.0, 4.0),
+    "quota": (0, 0.0, 0.0),  # daily token quota: nothing to gain until tomorrow
+    "client": (0, 0.0, 0.0),  # bad request, access, model not enabled
+}
+
+_ERROR_CLASSES = (
+    ("quota", ("Too many tokens per day", "ServiceQuotaExceededException")),
+    ("throttling", ("ThrottlingException", "TooManyRequestsException")),
+    ("transient", (
+        "ServiceUnavailableException",
+        "InternalServerException",
+        "ModelTimeoutException",
+        "ModelNotReadyException",
+        "ModelErrorException",
+        "ModelStreamErrorException",
+    )),
+    ("client", ("AccessDeniedException", "ValidationException", "ResourceNotFoundException")),
+)
+
+
+def classify_bedrock_error(e: Exception) -> str:
+    """Row of RETRY_MATRIX that applies to e."""
+    if isinstance(e, (EndpointConnectionError, ConnectionClosedError, ConnectTimeoutError, ReadTimeoutError)):
+        return "transient"
+    msg = str(e)
+    code = e.response.get("Error", {}).get("Code", "") if isinstance(e, ClientError) else ""
+    for name, markers in _ERROR_CLASSES:
+        if code in markers or any(m in msg for m in markers):
+            return name
+    return "unknown"
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: retry n of an error class sleeps
+    uniform(0, min(max_delay, base * 2**n)). Classes with 0 retries fail
+    on the first error.
+    """
+
+    def __init__(self, matrix: Optional[Dict[str, Tuple[int, float, float]]] = None) -> None:
+        self.matrix = dict(RETRY_MATRIX if matrix is None else matrix)
+
+    def retries(self, error_class: str) -> int:
+        return self.matrix.get(error_class, self.matrix["unknown"])[0]
+
+    def delay(self, error_class: str, attempt: int) -> float:
+        _, base, cap = self.matrix.get(error_class, self.matrix["unknown"])
+        return random.uniform(0.0, min(cap, base * (2 ** attempt)))
+
+
+def load_retry_policy(raw: str) -> RetryPolicy:
+    """BEDROCK_RETRY_MATRIX: JSON {class: [retries, base, max]} merged over RETRY_MATRIX."""
+    matrix = dict(RETRY_MATRIX)
+    if raw.strip():
+        for name, row in json.loads(raw).items():
+            retries, base, cap = row
+            matrix[name] = (int(retries), float(base), float(cap))
+    return RetryPolicy(matrix)
+
+
+class TokenBucket:
+    """
+    Refills at rate_per_minute up to capacity. reserve() always succeeds
+    and returns how long the caller must wait for its share, so concurrent
+    callers queue in arrival order instead of racing.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, n: float) -> float:
+        with self._lock:
+            self._refill()
+            self.tokens -= min(n, self.capacity)
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def credit(self, n: float) -> None:
+        """Return (n > 0) or charge (n < 0) tokens after the fact."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + n)
+
+    def drain(self) -> None:
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+
+class BedrockRateLimiter:
+    """
+    Client-side pacing to the account's Bedrock quota: one bucket for
+    requests per minute, one for tokens per minute (either may be off).
+    A request reserves its input estimate plus max_tokens, the way Bedrock
+    itself counts against TPM, and settles to the actual usage afterwards.
+    A throttling response drains both buckets so queued callers back off
+    too.
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0) -> None:
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int, deadline: Optional[float] = None) -> None:
+        """Wait for a request slot and tokens; DeadlineExceeded if that ends past deadline."""
+        wait = max(
+            self.requests.reserve(1) if self.requests else 0.0,
+            self.tokens.reserve(tokens) if self.tokens else 0.0,
+        )
+        if deadline is not None and time.monotonic() + wait >= deadline:
+            if self.requests:
+                self.requests.credit(1)
+            if self.tokens:
+                self.tokens.credit(tokens)
+            raise DeadlineExceeded(f"rate limit wait of {wait:.1f}s would pass the deadline")
+        if wait > 0:
+            with self._lock:
+                self.waited += wait
+            time.sleep(wait)
+
+    def settle(self, reserved: int, used: int) -> None:
+        if self.tokens:
+            self.tokens.credit(reserved - used)
+
+    def throttled(self) -> None:
+        for bucket in (self.requests, self.tokens):
+            if bucket:
+                bucket.drain()
+
+
+_BEDROCK_LIMITER: Optional[BedrockRateLimiter] = None
+_BEDROCK_POLICY: Optional[RetryPolicy] = None
+_BEDROCK_RETRY_STATS: Counter = Counter()
+_BEDROCK_USAGE: Counter = Counter()
+_BEDROCK_STATE_LOCK = threading.Lock()
+
+
+def bedrock_rate_limiter() -> BedrockRateLimiter:
+    """Process-wide limiter from BEDROCK_RPM / BEDROCK_TPM (0 or unset = off)."""
+    global _BEDROCK_LIMITER
+    with _BEDROCK_STATE_LOCK:
+        if _BEDROCK_LIMITER is None:
+            _BEDROCK_LIMITER = BedrockRateLimiter(
+                rpm=float(os.getenv("BEDROCK_RPM", "0")),
+                tpm=float(os.getenv("BEDROCK_TPM", "0")),
+            )
+        return _BEDROCK_LIMITER
+
+
+def bedrock_retry_policy() -> RetryPolicy:
+    """Process-wide policy from BEDROCK_RETRY_MATRIX."""
+    global _BEDROCK_POLICY
+    with _BEDROCK_STATE_LOCK:
+        if _BEDROCK_POLICY is None:
+            _BEDROCK_POLICY = load_retry_policy(os.getenv("BEDROCK_RETRY_MATRIX", ""))
+        return _BEDROCK_POLICY
+
+
+def _bedrock_call(
+    call: Callable[[], Any],
+    *,
+    reserve: int,
+    policy: Optional[RetryPolicy],
+    cancel: Optional[threading.Event] = None,
+    deadline: Optional[float] = None,
+) -> Any:
+    """
+    Run call() under the rate limiter, retrying per the policy. Setting
+    cancel (a hedge that lost) stops further attempts and backoff sleeps.
+    No retry is started whose backoff would end past deadline.
+    """
+    policy = policy or bedrock_retry_policy()
+    limiter = bedrock_rate_limiter()
+    cancel = cancel or threading.Event()
+    attempt = 0
+    while True:
+        if cancel.is_set():
+            raise CancelledError()
+        remaining_timeout(deadline)
+        limiter.acquire(reserve, deadline)
+        try:
+            return call()
+        except Exception as e:
+            error_class = classify_bedrock_error(e)
+            if error_class == "throttling":
+                limiter.throttled()
+            if attempt >= policy.retries(error_class):
+                raise
+            delay = policy.delay(error_class, attempt)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            with _BEDROCK_STATE_LOCK:
+                _BEDROCK_RETRY_STATS[error_class] += 1
+            if cancel.wait(delay):
+                raise CancelledError()
+            attempt += 1
+
+
+def bedrock_call_stats() -> Dict[str, Any]:
+    limiter = bedrock_rate_limiter()
+    with _BEDROCK_STATE_LOCK:
+        retries = dict(_BEDROCK_RETRY_STATS)
+        usage = dict(_BEDROCK_USAGE)
+    return {"retries": retries, "rate_limit_wait_s": round(limiter.waited, 3), "usage": usage}
+
+
+def record_bedrock_usage(
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    estimated_input_tokens: int = 0,
+    max_tokens: int = 0,
+) -> None:
+    """Actual usage next to what was estimated/budgeted before the call."""
+    with _BEDROCK_STATE_LOCK:
+        _BEDROCK_USAGE["calls"] += 1
+        _BEDROCK_USAGE["input_tokens"] += input_tokens
+        _BEDROCK_USAGE["estimated_input_tokens"] += estimated_input_tokens
+        _BEDROCK_USAGE["output_tokens"] += output_tokens
+        _BEDROCK_USAGE["max_tokens"] += max_tokens
+
+
+# ----------------------------
+# Bedrock circuit breaker
+# ----------------------------
+class CircuitOpenError(RuntimeError):
+    """Bedrock skipped because the circuit breaker is open."""
+
+
+PROBE_RETRY_POLICY = RetryPolicy({name: (0, 0.0, 0.0) for name in RETRY_MATRIX})
+
+
+class LocalBreakerStore:
+    """Breaker states as one JSON object {name: state} in a local file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            return json.loads(read_text_file(self.path))
+        except FileNotFoundError:
+            return {}
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._read().get(name)
+
+    def save(self, name: str, state: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        states = self._read()
+        if expected_version is not None and states.get(name, {}).get("version", 0) != expected_version:
+            return False
+        states[name] = state
+        tmp = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(states, f)
+        os.replace(tmp, self.path)
+        return True
+
+
+class DynamoBreakerStore:
+    """
+    One item per breaker, partition key breaker_id (S). Claiming the
+    half-open probe is a conditional write on version, so only one of
+    several concurrent runs gets to probe.
+    """
+
+    def __init__(self, table_name: str, region: str) -> None:
+        self.table = aws_resource("dynamodb", region).Table(table_name)
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        item = self.table.get_item(Key={"breaker_id": name}, ConsistentRead=True).get("Item")
+        if item is None:
+            return None
+        return {
+            "state": item["state"],
+            "failures": int(item["failures"]),
+            "opened_at": float(item["opened_at"]),
+            "version": int(item["version"]),
+        }
+
+    def save(self, name: str, state: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        item = {
+            "breaker_id": name,
+            "state": state["state"],
+            "failures": state["failures"],
+            "opened_at": Decimal(str(state["opened_at"])),
+            "version": state["version"],
+            "updated_at": now_iso(),
+        }
+        if expected_version is None:
+            self.table.put_item(Item=item)
+            return True
+        try:
+            self.table.put_item(
+                Item=item,
+                ConditionExpression="attribute_not_exists(breaker_id) OR version = :v",
+                ExpressionAttributeValues={":v": expected_version},
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                return False
+            raise
+        return True
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive runs that fell back.
+    While open, runs skip Bedrock. Once open_seconds have passed, one run
+    claims half-open and probes Bedrock (without retries): success closes
+    the circuit, failure re-opens it for another open_seconds. The state
+    lives in the store so it carries across runs; if the store cannot be
+    read the breaker stays out of the way (closed).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, store: Any, name: str, failure_threshold: int = 3, open_seconds: float = 900) -> None:
+        self.store = store
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+
+    @classmethod
+    def from_location(cls, location: str, name: str, region: str, **kwargs: Any) -> "CircuitBreaker":
+        """Local JSON file path or dynamodb://table."""
+        if location.startswith("dynamodb://"):
+            return cls(DynamoBreakerStore(location[11:], region), name, **kwargs)
+        return cls(LocalBreakerStore(location), name, **kwargs)
+
+    def _load(self) -> Dict[str, Any]:
+        return self.store.load(self.name) or {"state": self.CLOSED, "failures": 0, "opened_at": 0.0, "version": 0}
+
+    def _save(self, state: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        state = dict(state, version=state["version"] + 1)
+        return self.store.save(self.name, state, expected_version)
+
+    def allow(self) -> str:
+        """State this run should act on: CLOSED (call), HALF_OPEN (probe) or OPEN (skip)."""
+        try:
+            st = self._load()
+            if st["state"] == self.CLOSED:
+                return self.CLOSED
+            if time.time() < st["opened_at"] + self.open_seconds:
+                return self.OPEN
+            # A probe that never reported back (crashed run) also expires here.
+            probe = dict(st, state=self.HALF_OPEN, opened_at=time.time())
+            return self.HALF_OPEN if self._save(probe, expected_version=st["version"]) else self.OPEN
+        except Exception as e:
+            print(f"WARN: circuit breaker unavailable ({e}); calling Bedrock.", file=sys.stderr)
+            return self.CLOSED
+
+    def record_success(self) -> None:
+        try:
+            st = self._load()
+            if st["state"] != self.CLOSED or st["failures"]:
+                self._save(dict(st, state=self.CLOSED, failures=0, opened_at=0.0))
+        except Exception as e:
+            print(f"WARN: circuit breaker update failed ({e}).", file=sys.stderr)
+
+    def record_failure(self) -> None:
+        try:
+            st = self._load()
+            failures = st["failures"] + 1
+            if st["state"] == self.HALF_OPEN or failures >= self.failure_threshold:
+                st = dict(st, state=self.OPEN, opened_at=time.time())
+            self._save(dict(st, failures=failures))
+        except Exception as e:
+            print(f"WARN: circuit breaker update failed ({e}).", file=sys.stderr)
+
+
+# ----------------------------
+# Multi-region hedging
+# ----------------------------
+class LatencyStats:
+    """
+    Rolling window of successful call latencies per "region/label",
+    persisted as JSON to a local path or s3://bucket/key so the hedge delay
+    is learned across runs.
+    """
+
+    WINDOW = 50
+
+    def __init__(self, samples: Optional[Dict[str, List[float]]] = None) -> None:
+        self.samples = samples or {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        with self._lock:
+            window = self.samples.setdefault(key, [])
+            window.append(round(seconds, 3))
+            del window[:-self.WINDOW]
+
+    def p95(self, key: str, min_samples: int = 5) -> Optional[float]:
+        with self._lock:
+            window = sorted(self.samples.get(key, ()))
+        if len(window) < min_samples:
+            return None
+        rank = -(-len(window) * 95 // 100)  # nearest-rank: ceil(0.95 * n)
+        return window[rank - 1]
+
+    @classmethod
+    def load(cls, location: str, region: str) -> "LatencyStats":
+        try:
+            if location.startswith("s3://"):
+                bucket, _, key = location[5:].partition("/")
+                obj = aws_client("s3", region).get_object(Bucket=bucket, Key=key)
+                return cls(json.loads(obj["Body"].read().decode("utf-8")))
+            if os.path.exists(location):
+                return cls(json.loads(read_text_file(location)))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                print(f"WARN: latency stats load failed ({e}).", file=sys.stderr)
+        except (OSError, ValueError) as e:
+            print(f"WARN: latency stats unreadable ({e}).", file=sys.stderr)
+        return cls()
+
+    def save(self, location: str, region: str) -> None:
+        with self._lock:
+            body = json.dumps(self.samples)
+        if location.startswith("s3://"):
+            bucket, _, key = location[5:].partition("/")
+            aws_client("s3", region).put_object(
+                Bucket=bucket,
+                Key=key,
+                Body=body.encode("utf-8"),
+                ContentType="application/json",
+            )
+        else:
+            with open(location, "w", encoding="utf-8") as f:
+                f.write(body)
+
+
+def start_daemon(fn: Callable[[], Any], name: str = "bedrock-deadline") -> Future:
+    """
+    Run fn on a daemon thread and return its Future. Unlike an executor
+    worker, an abandoned daemon thread does not hold up interpreter exit.
+    """
+    future: Future = Future()
+
+    def runner() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=runner, name=name, daemon=True).start()
+    return future
+
+
+class RegionHedge:
+    """
+    Hedged requests across Bedrock regions. run() calls the primary region
+    first; if it has not answered after the p95 of its past latencies for
+    that call (default_delay until there is enough history), or fails, the
+    same call is sent to the next region. The first success wins; the
+    others are cancelled (their retry loops stop) and their answers
+    discarded. Calls run on daemon threads, so a losing call still in
+    flight holds up neither the caller nor interpreter exit.
+    """
+
+    def __init__(self, regions: List[str], default_delay: float = 10.0, latency: Optional[LatencyStats] = None) -> None:
+        self.regions = regions
+        self.default_delay = default_delay
+        self.latency = latency or LatencyStats()
+        self.winners: Dict[str, str] = {}
+        self.hedged = 0
+        self._lock = threading.Lock()
+
+    def delay(self, label: str) -> float:
+        p95 = self.latency.p95(f"{self.regions[0]}/{label}")
+        return self.default_delay if p95 is None else p95
+
+    def run(self, label: str, call: Callable[[str, threading.Event], Any]) -> Any:
+        """call(region, cancel) -> result; returns the first successful result."""
+        cancel = threading.Event()
+        regions: Dict[Future, str] = {}
+        waiting = list(self.regions)
+        errors: List[BaseException] = []
+
+        def launch() -> Future:
+            region = waiting.pop(0)
+            started = time.monotonic()
+
+            def timed() -> Any:
+                result = call(region, cancel)
+                self.latency.record(f"{region}/{label}", time.monotonic() - started)
+                return result
+
+            future = start_daemon(timed, name=f"hedge-{label}-{region}")
+            regions[future] = region
+            return future
+
+        try:
+            running = {launch()}
+            while running:
+                timeout = self.delay(label) if waiting else None
+                done, running = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        with self._lock:
+                            self.winners[label] = regions[future]
+                        return future.result()
+                    errors.append(future.exception())
+                if waiting:
+                    # Timed out or failed: hedge to the next region.
+                    with self._lock:
+                        self.hedged += 1
+                    running.add(launch())
+            raise errors[0]
+        finally:
+            cancel.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"winners": dict(self.winners), "hedged": self.hedged}
+
+
 # ----------------------------
 # Bedrock invocation
 # ----------------------------
+class TruncatedResponseError(RuntimeError):
+    """Output still cut off at max_tokens after the allowed continuations."""
+
+
+class MalformedResponseError(ValueError):
+    """AI output that does not hold what the prompt asked for (no JSON, no tool call)."""
+
+
+def _anthropic_body(
+    prompt: str,
+    max_tokens: int,
+    temperature: float,
+    prefill: str = "",
+    tool: Optional[Dict[str, Any]] = None,
+) -> bytes:
+    messages = [{"role": "user", "content": prompt}]
+    if prefill:
+        # The model resumes right after a trailing assistant turn.
+        messages.append({"role": "assistant", "content": prefill})
+    body: Dict[str, Any] = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "messages": messages,
+    }
+    if tool is not None:
+        # Forced tool choice: the answer is the tool's input, nothing else.
+        body["tools"] = [tool]
+        body["tool_choice"] = {"type": "tool", "name": tool["name"]}
+    return json.dumps(body).encode("utf-8")
+
+
+def continuation_limits() -> Tuple[int, int, float]:
+    """
+    (continuations, total output tokens, seconds) allowed for finishing an
+    answer cut off at max_tokens: BEDROCK_MAX_CONTINUATIONS (default 2),
+    BEDROCK_CONTINUATION_MAX_TOKENS (default 12000, all parts together) and
+    BEDROCK_CONTINUATION_MAX_SECONDS (default 90, from the first request).
+    """
+    return (
+        int(os.getenv("BEDROCK_MAX_CONTINUATIONS", "2")),
+        int(os.getenv("BEDROCK_CONTINUATION_MAX_TOKENS", "12000")),
+        float(os.getenv("BEDROCK_CONTINUATION_MAX_SECONDS", "90")),
+    )
+
+
+def _next_continuation(parts: int, output_tokens: int, started: float, max_tokens: int) -> int:
+    """max_tokens for the next continuation, or raise if a limit is spent."""
+    continuations, token_limit, seconds = continuation_limits()
+    remaining = token_limit - output_tokens
+    if parts > continuations or remaining <= 0 or time.monotonic() - started >= seconds:
+        raise TruncatedResponseError(
+            f"Bedrock output still truncated at max_tokens after {parts - 1} continuation(s), "
+            f"{output_tokens} output tokens, {time.monotonic() - started:.1f}s"
+        )
+    with _BEDROCK_STATE_LOCK:
+        _BEDROCK_USAGE["continuations"] += 1
+    return min(max_tokens, remaining)
+
+
 def bedrock_invoke_text(
     *,
     bedrock_region: str,
@@ -284,37 +1857,177 @@ def bedrock_invoke_text(
     prompt: str,
     max_tokens: int,
     temperature: float = 0.2,
-    retries: int = 1,
-    backoff_seconds: float = 2.0,
+    policy: Optional[RetryPolicy] = None,
+    cancel: Optional[threading.Event] = None,
+    deadline: Optional[float] = None,
+    tool: Optional[Dict[str, Any]] = None,
 ) -> str:
-    client = boto3.client("bedrock-runtime", region_name=bedrock_region)
-    body = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": max_tokens,
-        "temperature": temperature,
-        "messages": [{"role": "user", "content": prompt}],
-    }
-
-    last_err: Optional[Exception] = None
-    for attempt in range(retries + 1):
-        try:
+    """
+    Text of a single-turn Anthropic request. If the answer stops at
+    max_tokens, it is continued by re-sending the prompt with the text so
+    far as an assistant prefill, within continuation_limits(); past those
+    TruncatedResponseError is raised rather than returning a cut-off page.
+    deadline (time.monotonic()) bounds socket timeouts and retries.
+
+    With tool, the model is made to call it and the tool input comes back
+    as JSON text. A cut-off tool call cannot be continued, so stopping at
+    max_tokens raises TruncatedResponseError straight away.
+    """
+    estimated = estimate_tokens(prompt)
+    started = time.monotonic()
+    text = ""
+    output_total = 0
+    part_tokens = max_tokens
+    parts = 1
+
+    while True:
+        body = _anthropic_body(prompt, part_tokens, temperature, prefill=text, tool=tool)
+        reserve = estimated + estimate_tokens(text) + part_tokens
+
+        def call() -> Dict[str, Any]:
+            # Per attempt: a retry gets a client timed to what is left.
+            client = aws_client("bedrock-runtime", bedrock_region, timeout=remaining_timeout(deadline))
             resp = client.invoke_model(
                 modelId=model_id,
-                body=json.dumps(body).encode("utf-8"),
+                body=body,
                 accept="application/json",
                 contentType="application/json",
             )
-            data = json.loads(resp["body"].read().decode("utf-8"))
-            return "\n".join(
-                item.get("text", "")
-                for item in data.get("content", [])
-                if isinstance(item, dict) and item.get("type") == "text"
-            ).strip()
-        except Exception as e:
-            last_err = e
-            if attempt < retries:
-                time.sleep(backoff_seconds * (attempt + 1))
-    raise last_err if last_err else RuntimeError("Unknown Bedrock error")
+            return json.loads(resp["body"].read().decode("utf-8"))
+
+        data = _bedrock_call(call, reserve=reserve, policy=policy, cancel=cancel, deadline=deadline)
+        usage = data.get("usage") or {}
+        input_tokens = int(usage.get("input_tokens", 0))
+        output_tokens = int(usage.get("output_tokens", 0))
+        record_bedrock_usage(input_tokens, output_tokens, reserve - part_tokens, part_tokens)
+        if usage:
+            bedrock_rate_limiter().settle(reserve, input_tokens + output_tokens)
+        if tool is not None:
+            return _tool_input_json(data, tool["name"], part_tokens)
+        text += "\n".join(
+            item.get("text", "")
+            for item in data.get("content", [])
+            if isinstance(item, dict) and item.get("type") == "text"
+        )
+        if data.get("stop_reason") != "max_tokens":
+            return text.strip()
+        output_total += output_tokens or part_tokens
+        part_tokens = _next_continuation(parts, output_total, started, max_tokens)
+        parts += 1
+        text = text.rstrip()  # a prefill may not end in whitespace
+
+
+def _tool_input_json(data: Dict[str, Any], name: str, max_tokens: int) -> str:
+    if data.get("stop_reason") == "max_tokens":
+        raise TruncatedResponseError(f"{name} call cut off at max_tokens ({max_tokens})")
+    for item in data.get("content", []):
+        if isinstance(item, dict) and item.get("type") == "tool_use" and item.get("name") == name:
+            return json.dumps(item.get("input") or {})
+    raise MalformedResponseError(f"AI output has no {name} tool call")
+
+
+def iter_bedrock_stream_text(
+    events: Iterable[Dict[str, Any]],
+    estimated_input_tokens: int = 0,
+    max_tokens: int = 0,
+    meta: Optional[Dict[str, Any]] = None,
+) -> Iterator[str]:
+    """
+    Text deltas from an invoke_model_with_response_stream body (Anthropic
+    messages events). Text blocks are separated by a newline, as in
+    bedrock_invoke_text. An in-stream error event is raised as a
+    RuntimeError starting with its name, e.g. "ThrottlingException: ...",
+    so is_bedrock_fallback_error still recognises it. meta, if given,
+    receives stop_reason and output_tokens.
+    """
+    blocks = 0
+    input_tokens = 0
+    for event in events:
+        chunk = event.get("chunk")
+        if chunk is None:
+            name = next(iter(event), "unknownStreamError")
+            detail = event.get(name) or {}
+            raise RuntimeError(f"{name[:1].upper()}{name[1:]}: {detail.get('message', '')}")
+        data = json.loads(chunk["bytes"])
+        kind = data.get("type")
+        if kind == "message_start":
+            input_tokens = int(data.get("message", {}).get("usage", {}).get("input_tokens", 0))
+        elif kind == "message_delta":
+            output_tokens = int(data.get("usage", {}).get("output_tokens", 0))
+            record_bedrock_usage(input_tokens, output_tokens, estimated_input_tokens, max_tokens)
+            if meta is not None:
+                meta["stop_reason"] = data.get("delta", {}).get("stop_reason")
+                meta["output_tokens"] = output_tokens
+        elif kind == "content_block_start":
+            if data.get("content_block", {}).get("type") == "text":
+                if blocks:
+                    yield "\n"
+                blocks += 1
+        elif kind == "content_block_delta":
+            delta = data.get("delta", {})
+            if delta.get("type") == "text_delta":
+                yield delta.get("text", "")
+
+
+def bedrock_stream_text(
+    *,
+    bedrock_region: str,
+    model_id: str,
+    prompt: str,
+    max_tokens: int,
+    temperature: float = 0.2,
+    policy: Optional[RetryPolicy] = None,
+    deadline: Optional[float] = None,
+) -> Iterator[str]:
+    """
+    Streaming counterpart of bedrock_invoke_text, continuations included:
+    a part that stops at max_tokens is followed by a new stream prefilled
+    with everything yielded so far. Opening each stream is paced and
+    retried the same way; a failure after text has started flowing is
+    raised, since the consumer has already seen part of the answer. TPM
+    reservations are not settled, so they err on the safe side.
+    """
+    estimated = estimate_tokens(prompt)
+    started = time.monotonic()
+    text = ""
+    output_total = 0
+    part_tokens = max_tokens
+    parts = 1
+
+    while True:
+        body = _anthropic_body(prompt, part_tokens, temperature, prefill=text)
+        reserve = estimated + estimate_tokens(text) + part_tokens
+        resp = _bedrock_call(
+            lambda: aws_client(
+                "bedrock-runtime", bedrock_region, timeout=remaining_timeout(deadline)
+            ).invoke_model_with_response_stream(
+                modelId=model_id,
+                body=body,
+                accept="application/json",
+                contentType="application/json",
+            ),
+            reserve=reserve,
+            policy=policy,
+            deadline=deadline,
+        )
+        meta: Dict[str, Any] = {}
+        # Trailing whitespace is held back: a prefill may not end in it, and
+        # the continuation re-emits whatever the model wants there.
+        held = ""
+        for piece in iter_bedrock_stream_text(resp["body"], reserve - part_tokens, part_tokens, meta):
+            piece = held + piece
+            ready = piece.rstrip()
+            held = piece[len(ready):]
+            if ready:
+                text += ready
+                yield ready
+        if meta.get("stop_reason") != "max_tokens":
+            if held:
+                yield held
+            return
+        output_total += meta.get("output_tokens") or part_tokens
+        part_tokens = _next_continuation(parts, output_total, started, max_tokens)
+        parts += 1
 
 
 def is_bedrock_fallback_error(e: Exception) -> bool:
@@ -323,6 +2036,11 @@ def is_bedrock_fallback_error(e: Exception) -> bool:
     rather than crashing the pipeline. Covers throttling, quota exhaustion,
     model not enabled in region, service errors, and timeouts.
     """
+    if isinstance(e, (CircuitOpenError, TruncatedResponseError, MalformedResponseError, DeadlineExceeded)):
+        return True
+    # Connection failures and (deadline-shortened) socket timeouts.
+    if isinstance(e, (EndpointConnectionError, ConnectionClosedError, ConnectTimeoutError, ReadTimeoutError)):
+        return True
     msg = str(e)
     fallback_strings = [
         "ThrottlingException",
@@ -334,6 +2052,7 @@ def is_bedrock_fallback_error(e: Exception) -> bool:
         "InternalServerException",
         "ModelErrorException",
         "ModelTimeoutException",
+        "ModelStreamErrorException",
     ]
     if any(s in msg for s in fallback_strings):
         return True
@@ -347,58 +2066,649 @@ def is_bedrock_fallback_error(e: Exception) -> bool:
 # ----------------------------
 # Prompts
 # ----------------------------
+PROMPT_TEMPLATE_VERSION = "1"  # bump when a build_*_prompt template or ATS_TOOL changes
+
+
+_HTML_REQUIREMENTS = (
+    "- Use semantic HTML tags (h1/h2/h3, p, ul/li).\n"
+    "- Do NOT include Markdown code fences.\n"
+    "- Keep styling minimal (no external assets).\n"
+)
+
+_ATS_SCHEMA = {
+    "word_count": 0,
+    "ats_score": 0,
+    "keywords": ["string"],
+    "readability": "Good|Fair|Poor",
+    "missing_sections": ["string"],
+}
+
+_ATS_GUIDANCE = (
+    "Guidance:\n"
+    "- ats_score must be 0-100 integer\n"
+    "- keywords: 10-20 items\n"
+    "- missing_sections: list any missing standard sections. "
+    "Note: 'PROFESSIONAL SUMMARY' fully satisfies the Summary section requirement. "
+    "Do NOT flag Summary as missing if a PROFESSIONAL SUMMARY section is present.\n"
+)
+
+ATS_TOOL_NAME = "record_ats_analysis"
+_SCHEMA_TYPES = {int: "integer", str: "string", list: "array"}
+
+# Tool whose input_schema mirrors REQUIRED_ANALYTICS_KEYS, for BEDROCK_ATS_TOOL.
+ATS_TOOL: Dict[str, Any] = {
+    "name": ATS_TOOL_NAME,
+    "description": "Record the ATS readiness analysis of the resume.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            key: (
+                {"type": "array", "items": {"type": "string"}}
+                if t is list else {"type": _SCHEMA_TYPES[t]}
+            )
+            for key, t in REQUIRED_ANALYTICS_KEYS.items()
+        },
+        "required": list(REQUIRED_ANALYTICS_KEYS),
+    },
+}
+ATS_TOOL["input_schema"]["properties"]["ats_score"].update(minimum=0, maximum=100)
+ATS_TOOL["input_schema"]["properties"]["readability"]["enum"] = ["Good", "Fair", "Poor"]
+
+COMBINED_ANALYTICS_MARKER = "===ANALYTICS==="
+COMBINED_HTML_MARKER = "===HTML==="
+
+
 def build_html_prompt(resume_md: str) -> str:
     return (
         "Convert the following resume in Markdown into clean, ATS-friendly HTML.\n"
         "Requirements:\n"
-        "- Use semantic HTML tags (h1/h2/h3, p, ul/li).\n"
-        "- Do NOT include Markdown code fences.\n"
-        "- Keep styling minimal (no external assets).\n"
+        f"{_HTML_REQUIREMENTS}"
         "- Output ONLY HTML.\n\n"
         f"RESUME_MARKDOWN:\n{resume_md}\n"
     )
 
 
 def build_ats_json_prompt(resume_md: str) -> str:
-    schema = {
-        "word_count": 0,
-        "ats_score": 0,
-        "keywords": ["string"],
-        "readability": "Good|Fair|Poor",
-        "missing_sections": ["string"],
-    }
     return (
         "Analyze the resume below for ATS readiness.\n"
         "Return STRICT JSON only (no markdown, no commentary).\n"
         "Schema keys must match exactly:\n"
-        f"{json.dumps(schema)}\n\n"
-        "Guidance:\n"
-        "- ats_score must be 0-100 integer\n"
-        "- keywords: 10-20 items\n"
-        "- missing_sections: list any missing standard sections. "
-        "Note: 'PROFESSIONAL SUMMARY' fully satisfies the Summary section requirement. "
-        "Do NOT flag Summary as missing if a PROFESSIONAL SUMMARY section is present.\n\n"
+        f"{json.dumps(_ATS_SCHEMA)}\n\n"
+        f"{_ATS_GUIDANCE}\n"
         f"RESUME_MARKDOWN:\n{resume_md}\n"
     )
 
 
+def build_ats_tool_prompt(resume_md: str) -> str:
+    """build_ats_json_prompt for ATS_TOOL: the schema travels as the tool's."""
+    return (
+        "Analyze the resume below for ATS readiness and record the result "
+        f"with the {ATS_TOOL_NAME} tool.\n\n"
+        f"{_ATS_GUIDANCE}\n"
+        f"RESUME_MARKDOWN:\n{resume_md}\n"
+    )
+
+
+def build_combined_prompt(resume_md: str) -> str:
+    """Both tasks in one request, so the resume is sent (and billed) once."""
+    return (
+        "Do two things with the resume below.\n\n"
+        "1. Analyze it for ATS readiness as STRICT JSON (no markdown, no commentary).\n"
+        "Schema keys must match exactly:\n"
+        f"{json.dumps(_ATS_SCHEMA)}\n"
+        f"{_ATS_GUIDANCE}\n"
+        "2. Convert it into clean, ATS-friendly HTML.\n"
+        "Requirements:\n"
+        f"{_HTML_REQUIREMENTS}\n"
+        "Output exactly two sections and nothing else, each marker on its own line:\n"
+        f"{COMBINED_ANALYTICS_MARKER}\n<the JSON>\n{COMBINED_HTML_MARKER}\n<the HTML>\n\n"
+        f"RESUME_MARKDOWN:\n{resume_md}\n"
+    )
+
+
+def split_combined_response(text: str) -> Tuple[str, str]:
+    """(html_raw, analytics_raw) from a build_combined_prompt answer."""
+    a = text.find(COMBINED_ANALYTICS_MARKER)
+    h = text.find(COMBINED_HTML_MARKER)
+    if a < 0 or h < 0:
+        raise MalformedResponseError("Combined AI output is missing a section marker")
+    if a < h:
+        analytics_raw = text[a + len(COMBINED_ANALYTICS_MARKER):h]
+        html_raw = text[h + len(COMBINED_HTML_MARKER):]
+    else:
+        html_raw = text[h + len(COMBINED_HTML_MARKER):a]
+        analytics_raw = text[a + len(COMBINED_ANALYTICS_MARKER):]
+    return html_raw.strip(), analytics_raw.strip()
+
+
+_JSON_DECODER = json.JSONDecoder()
+# raw_decode attempts per answer; each may read to the end of the text.
+_JSON_SCAN_LIMIT = 32
+
+
 def extract_json(text: str) -> Dict[str, Any]:
+    """
+    The JSON object in an AI answer: the whole text if it is one, else the
+    first "{" from which JSONDecoder.raw_decode reads a complete object.
+    Prose around or between objects is skipped; the scan stops at the
+    first object that decodes, or after _JSON_SCAN_LIMIT tries. Too deeply
+    nested JSON counts as no JSON. MalformedResponseError if none is found.
+    """
     text = text.strip()
     try:
-        return json.loads(text)
-    except Exception:
+        obj = json.loads(text)
+    except (ValueError, RecursionError):
         pass
-    m = re.search(r"\{.*\}", text, flags=re.DOTALL)
-    if not m:
-        raise ValueError("No JSON object found in AI output")
-    return json.loads(m.group(0))
+    else:
+        if isinstance(obj, dict):
+            return obj
+    start = text.find("{")
+    for _ in range(_JSON_SCAN_LIMIT):
+        if start < 0:
+            break
+        try:
+            obj = _JSON_DECODER.raw_decode(text, start)[0]
+        except (ValueError, RecursionError):
+            obj = None
+        if isinstance(obj, dict):
+            return obj
+        start = text.find("{", start + 1)
+    raise MalformedResponseError("No JSON object found in AI output")
+
+
+# ----------------------------
+# Bedrock response cache
+# ----------------------------
+def response_cache_key(
+    model_id: str,
+    prompt: str,
+    max_tokens: int,
+    temperature: float,
+    template_version: str = PROMPT_TEMPLATE_VERSION,
+) -> str:
+    sig = json.dumps([template_version, model_id, max_tokens, temperature, prompt])
+    return hashlib.sha256(sig.encode("utf-8")).hexdigest()
+
+
+class LocalResponseStore:
+    """One JSON file per entry; the file mtime is the last access time."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(read_text_file(self._path(key)))
+        except FileNotFoundError:
+            return None
+
+    def touch(self, key: str) -> None:
+        os.utime(self._path(key))
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        tmp = f"{self._path(key)}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, self._path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def scan(self) -> List[Tuple[str, float]]:
+        out = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    out.append((name[:-5], os.path.getmtime(os.path.join(self.directory, name))))
+                except FileNotFoundError:
+                    pass
+        return out
+
+
+class S3ResponseStore:
+    """
+    One object per entry under a prefix. A hit copies the object onto
+    itself, which moves LastModified forward, so LastModified is the last
+    access time.
+    """
+
+    def __init__(self, bucket: str, prefix: str, region: str) -> None:
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/") + "/" if prefix else ""
+        self.s3 = aws_client("s3", region)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.json")
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return json.loads(obj["Body"].read().decode("utf-8"))
+
+    def touch(self, key: str) -> None:
+        k = f"{self.prefix}{key}.json"
+        self.s3.copy_object(
+            Bucket=self.bucket,
+            Key=k,
+            CopySource={"Bucket": self.bucket, "Key": k},
+            MetadataDirective="REPLACE",
+            ContentType="application/json",
+        )
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}{key}.json",
+            Body=json.dumps(entry).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+    def delete(self, key: str) -> None:
+        self.s3.delete_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.json")
+
+    def scan(self) -> List[Tuple[str, float]]:
+        out = []
+        for page in self.s3.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                name = obj["Key"][len(self.prefix):]
+                if name.endswith(".json") and "/" not in name:
+                    out.append((name[:-5], obj["LastModified"].timestamp()))
+        return out
+
+
+class DynamoResponseStore:
+    """
+    One item per entry, partition key cache_key (S). expires_at is a
+    number of epoch seconds, so it can double as the table's native TTL
+    attribute; accessed is updated on every hit. Uses the low-level
+    client (typed attribute values), since parallel Bedrock calls share
+    the store and boto3 resources are not thread-safe.
+    """
+
+    def __init__(self, table_name: str, region: str) -> None:
+        self.table_name = table_name
+        self.dynamodb = aws_client("dynamodb", region)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self.dynamodb.get_item(TableName=self.table_name, Key={"cache_key": {"S": key}}).get("Item")
+        if item is None:
+            return None
+        return {
+            "text": item["text"]["S"],
+            "created": int(item["created"]["N"]),
+            "expires_at": int(item["expires_at"]["N"]),
+        }
+
+    def touch(self, key: str) -> None:
+        self.dynamodb.update_item(
+            TableName=self.table_name,
+            Key={"cache_key": {"S": key}},
+            UpdateExpression="SET accessed = :now",
+            ExpressionAttributeValues={":now": {"N": str(int(time.time()))}},
+        )
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        self.dynamodb.put_item(
+            TableName=self.table_name,
+            Item={
+                "cache_key": {"S": key},
+                "text": {"S": entry["text"]},
+                "created": {"N": str(entry["created"])},
+                "expires_at": {"N": str(entry["expires_at"])},
+                "accessed": {"N": str(entry["created"])},
+            },
+        )
+
+    def delete(self, key: str) -> None:
+        self.dynamodb.delete_item(TableName=self.table_name, Key={"cache_key": {"S": key}})
+
+    def scan(self) -> List[Tuple[str, float]]:
+        out = []
+        pages = self.dynamodb.get_paginator("scan").paginate(
+            TableName=self.table_name,
+            ProjectionExpression="cache_key, accessed",
+        )
+        for page in pages:
+            out.extend(
+                (item["cache_key"]["S"], float(item.get("accessed", {"N": "0"})["N"]))
+                for item in page.get("Items", [])
+            )
+        return out
+
+
+class ResponseCache:
+    """
+    Raw Bedrock response text keyed by response_cache_key. Entries expire
+    ttl_seconds after they were written. max_entries (0 = unbounded) is a
+    soft LRU cap: listing a store is a full scan, so only about one write
+    in evict_every (default a tenth of max_entries) sweeps it and evicts
+    the least recently used entries beyond max_entries. Which writes
+    sweep is decided by the key hash, so the rate holds across one-shot
+    processes too; one process also never goes evict_every writes
+    without a sweep. Backend failures are reported and treated as misses,
+    never as errors.
+    """
+
+    def __init__(
+        self,
+        store: Any,
+        ttl_seconds: int = 7 * 24 * 3600,
+        max_entries: int = 100,
+        evict_every: Optional[int] = None,
+    ) -> None:
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every if evict_every is not None else max_entries // 10)
+        self._unswept = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_location(cls, location: str, region: str, **kwargs: Any) -> "ResponseCache":
+        """Directory path, s3://bucket/prefix or dynamodb://table."""
+        if location.startswith("s3://"):
+            bucket, _, prefix = location[5:].partition("/")
+            return cls(S3ResponseStore(bucket, prefix, region), **kwargs)
+        if location.startswith("dynamodb://"):
+            return cls(DynamoResponseStore(location[11:], region), **kwargs)
+        return cls(LocalResponseStore(location), **kwargs)
+
+    def _count(self, field: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            entry = self.store.get(key)
+            if entry is not None and entry["expires_at"] <= time.time():
+                self.store.delete(key)
+                entry = None
+            if entry is not None:
+                self.store.touch(key)
+        except Exception as e:
+            print(f"WARN: response cache read failed ({e}); calling Bedrock.", file=sys.stderr)
+            entry = None
+        self._count("misses" if entry is None else "hits")
+        return None if entry is None else entry["text"]
+
+    def _due_sweep(self, key: str) -> bool:
+        # Keys are sha256 hex digests, so the hash test picks writes uniformly.
+        with self._lock:
+            self._unswept += 1
+            due = self._unswept >= self.evict_every or int(key[:8], 16) % self.evict_every == 0
+            if due:
+                self._unswept = 0
+            return due
+
+    def put(self, key: str, text: str) -> None:
+        now = int(time.time())
+        try:
+            self.store.put(key, {"text": text, "created": now, "expires_at": now + self.ttl_seconds})
+            if self.max_entries > 0 and self._due_sweep(key):
+                entries = self.store.scan()
+                excess = len(entries) - self.max_entries
+                if excess > 0:
+                    oldest = sorted((e for e in entries if e[0] != key), key=lambda e: e[1])[:excess]
+                    for old_key, _ in oldest:
+                        self.store.delete(old_key)
+                    self._count("evictions", len(oldest))
+        except Exception as e:
+            print(f"WARN: response cache write failed ({e}).", file=sys.stderr)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+# ----------------------------
+# Model routing
+# ----------------------------
+def load_model_routes(raw: str, default_model: str) -> Dict[str, List[str]]:
+    """
+    MODEL_ROUTES: JSON {prompt kind: model ID or [model ID, ...]}, each list
+    a fallback chain tried in order. Kinds left out use default_model.
+    """
+    routes = {kind: [default_model] for kind in OUTPUT_BUDGETS}
+    if raw.strip():
+        for kind, chain in json.loads(raw).items():
+            if kind not in OUTPUT_BUDGETS:
+                raise RuntimeError(f"MODEL_ROUTES has unknown prompt kind {kind!r}")
+            chain = [chain] if isinstance(chain, str) else [str(m) for m in chain]
+            if not chain:
+                raise RuntimeError(f"MODEL_ROUTES[{kind!r}] is empty")
+            routes[kind] = chain
+    return routes
+
+
+def routed_models(used_models: Dict[str, str]) -> Dict[str, str]:
+    """Per-record model from bedrock_generate's used_models (combined serves both)."""
+    combined = used_models.get("combined")
+    return {
+        "html": used_models.get("html", combined or ""),
+        "ats": used_models.get("ats", combined or ""),
+    }
+
+
+# ----------------------------
+# Bedrock generation
+# ----------------------------
+def bedrock_generate(
+    *,
+    bedrock_region: str,
+    model_id: str,
+    resume_md: str,
+    views_api_url: str = "",
+    parallel: bool = False,
+    html_sink: Optional[Callable[..., str]] = None,
+    cache: Optional[ResponseCache] = None,
+    policy: Optional[RetryPolicy] = None,
+    hedge: Optional[RegionHedge] = None,
+    combined: bool = False,
+    max_tokens: Optional[Dict[str, int]] = None,
+    deadline: Optional[float] = None,
+    routes: Optional[Dict[str, List[str]]] = None,
+    used_models: Optional[Dict[str, str]] = None,
+    ats_tool: bool = False,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    AI Call #1 (HTML) and AI Call #2 (ATS JSON). Returns (html, analytics).
+
+    With html_sink, the HTML call streams instead: sanitized bytes are
+    handed to html_sink(chunks, gate=gate) while tokens are still
+    arriving, and whatever the sink returns (the S3 URL) takes the place of
+    the HTML. The sink must hold its final write on the PublishGate, which
+    opens only once the ATS result has been accepted, so a page is never
+    live for a run that then falls back. Sequential mode makes the (small)
+    ATS call first.
+
+    With a cache, each call first looks up its response by
+    response_cache_key; a hit skips Bedrock entirely. policy overrides the
+    process-wide retry policy (e.g. no retries for a circuit probe).
+    With a hedge, non-streamed calls race across hedge.regions (the first
+    of which should be bedrock_region); a streamed HTML call stays in
+    bedrock_region, since its output is already on its way to S3.
+
+    max_tokens maps prompt kind (html, ats, combined) to its output budget;
+    by default each is sized from the resume with size_max_tokens.
+    deadline (time.monotonic()) bounds every Bedrock call, retries included.
+
+    routes maps prompt kind to a chain of model IDs (load_model_routes);
+    kinds without one use model_id. A fallback error moves the call to the
+    next model of its chain; only the last model's error is raised.
+    used_models, if given, receives the model that answered each kind.
+
+    ats_tool=True asks for the split-mode analytics as an ATS_TOOL call
+    (build_ats_tool_prompt), so they arrive as typed tool input instead of
+    JSON inside text. Models without tool use should stay on the default.
+
+    combined=True sends build_combined_prompt instead: one request, the
+    resume's input tokens paid once. Nothing is streamed in that mode (the
+    html_sink still receives the finished page) and parallel is moot.
+
+    With parallel=True both calls are issued at once on two threads and the
+    wall time is that of the slower call. The first failure from either
+    side is raised immediately without waiting for the other, so a
+    fallback error on one call sends both to the deterministic path, same
+    as the sequential mode.
+    """
+    if max_tokens is None:
+        resume_tokens = estimate_tokens(resume_md)
+        max_tokens = {kind: size_max_tokens(kind, resume_tokens) for kind in OUTPUT_BUDGETS}
+    budgets = max_tokens
+    gate = PublishGate()
+
+    def routed(kind: str, attempt: Callable[[str], Any]) -> Any:
+        chain = (routes or {}).get(kind) or [model_id]
+        for i, model in enumerate(chain):
+            try:
+                out = attempt(model)
+            except Exception as e:
+                last = i + 1 == len(chain)
+                if last or not is_bedrock_fallback_error(e) or isinstance(e, DeadlineExceeded):
+                    raise
+                print(
+                    f"WARN: {kind} call to {model} failed ({type(e).__name__}); trying {chain[i + 1]}.",
+                    file=sys.stderr,
+                )
+                continue
+            if used_models is not None:
+                used_models[kind] = model
+            return out
+
+    def call(
+        label: str,
+        model_id: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        parse: Callable[[str], Any],
+        tool: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        # Only responses that parse are cached; a bad one is retried next run.
+        key = response_cache_key(model_id, prompt, max_tokens, temperature) if cache else ""
+        text = cache.get(key) if cache else None
+        if text is not None:
+            return parse(text)
+
+        def invoke(region: str, cancel: Optional[threading.Event] = None) -> str:
+            return bedrock_invoke_text(
+                bedrock_region=region,
+                model_id=model_id,
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                policy=policy,
+                cancel=cancel,
+                deadline=deadline,
+                tool=tool,
+            )
+
+        text = hedge.run(label, invoke) if hedge else invoke(bedrock_region)
+        out = parse(text)
+        if cache:
+            cache.put(key, text)
+        return out
+
+    def html_call(model_id: str) -> str:
+        prompt = build_html_prompt(resume_md)
+        if html_sink is None:
+            return call(
+                "html", model_id, prompt, budgets["html"], 0.2,
+                lambda raw: sanitize_html(raw, views_api_url=views_api_url),
+            )
+
+        key = response_cache_key(model_id, prompt, budgets["html"], 0.2) if cache else ""
+        text = cache.get(key) if cache else None
+        if text is not None:
+            return html_sink(iter_sanitized_html([text], views_api_url=views_api_url), gate=gate)
+        parts: List[str] = []
+
+        def tee(pieces: Iterable[str]) -> Iterator[str]:
+            for piece in pieces:
+                if gate.abandoned:
+                    raise CancelledError()
+                parts.append(piece)
+                yield piece
+
+        url = html_sink(iter_sanitized_html(
+            tee(bedrock_stream_text(
+                bedrock_region=bedrock_region,
+                model_id=model_id,
+                prompt=prompt,
+                max_tokens=budgets["html"],
+                temperature=0.2,
+                policy=policy,
+                deadline=deadline,
+            )),
+            views_api_url=views_api_url,
+        ), gate=gate)
+        if cache:
+            cache.put(key, "".join(parts).strip())
+        return url
+
+    def ats_call(model_id: str) -> Dict[str, Any]:
+        prompt = build_ats_tool_prompt(resume_md) if ats_tool else build_ats_json_prompt(resume_md)
+        return call(
+            "ats", model_id, prompt, budgets["ats"], 0.1,
+            lambda raw: validate_analytics(extract_json(raw)),
+            tool=ATS_TOOL if ats_tool else None,
+        )
+
+    if combined:
+        # One request; the answer is split and checked exactly like the
+        # two separate responses would be.
+        def split(raw: str) -> Tuple[str, Dict[str, Any]]:
+            html_raw, ats_raw = split_combined_response(raw)
+            return (
+                sanitize_html(html_raw, views_api_url=views_api_url),
+                validate_analytics(extract_json(ats_raw)),
+            )
+
+        prompt = build_combined_prompt(resume_md)
+        html, ats = routed(
+            "combined", lambda model: call("combined", model, prompt, budgets["combined"], 0.1, split)
+        )
+        gate.open()
+        return (html_sink(iter([html.encode("utf-8")]), gate=gate) if html_sink else html), ats
+
+    def accepted_ats() -> Dict[str, Any]:
+        ats = routed("ats", ats_call)
+        gate.open()
+        return ats
+
+    if not parallel:
+        ats = accepted_ats()
+        return routed("html", html_call), ats
+
+    # Daemon threads: a call still in flight when the other fails holds up
+    # neither the fallback nor interpreter exit.
+    html_future = start_daemon(functools.partial(routed, "html", html_call), name="bedrock-html")
+    ats_future = start_daemon(accepted_ats, name="bedrock-ats")
+    done, _ = wait((html_future, ats_future), return_when=FIRST_EXCEPTION)
+    for future in (html_future, ats_future):
+        if future in done and future.exception() is not None:
+            # main() publishes the fallback next; a streamed page held at
+            # the gate (or still in flight) must not land on top of it.
+            gate.abandon()
+            raise future.exception()
+    return html_future.result(), ats_future.result()
 
 
 # ----------------------------
 # AWS writes
 # ----------------------------
-def upload_html_to_s3(region: str, bucket: str, env: str, html: str) -> str:
-    s3 = boto3.client("s3", region_name=region)
+def upload_html_to_s3(region: str, bucket: str, env: str, html: str, deadline: Optional[float] = None) -> str:
+    s3 = aws_client("s3", region, timeout=remaining_timeout(deadline))
     key = f"{env}/index.html"
     s3.put_object(
         Bucket=bucket,
@@ -410,6 +2720,107 @@ def upload_html_to_s3(region: str, bucket: str, env: str, html: str) -> str:
     return f"https://{bucket}.s3.amazonaws.com/{key}"
 
 
+S3_PART_SIZE = 8 * 1024 * 1024  # multipart parts must be >= 5 MiB (except the last)
+
+
+class PublishGate:
+    """
+    Holds a streamed upload's final write until the run decides: open()
+    lets it publish, abandon() drops it. The first decision wins.
+    """
+
+    def __init__(self) -> None:
+        self._decided = threading.Event()
+        self._lock = threading.Lock()
+        self.abandoned = False
+
+    def open(self) -> None:
+        with self._lock:
+            self._decided.set()
+
+    def abandon(self) -> None:
+        with self._lock:
+            if not self._decided.is_set():
+                self.abandoned = True
+                self._decided.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True once opened; False if abandoned or still undecided after timeout."""
+        return self._decided.wait(timeout) and not self.abandoned
+
+
+def upload_stream_to_s3(
+    region: str,
+    bucket: str,
+    env: str,
+    chunks: Iterable[bytes],
+    part_size: int = S3_PART_SIZE,
+    deadline: Optional[float] = None,
+    gate: Optional[PublishGate] = None,
+) -> str:
+    """
+    Upload an iterable of HTML byte chunks to s3://<bucket>/<env>/index.html
+    without joining them first. Output that fits in one part goes up as a
+    plain put_object; anything larger becomes a multipart upload so only
+    one part is held in memory. The multipart upload is aborted on error.
+    With a gate, the final put_object / complete_multipart_upload waits
+    for it (up to deadline); if it is abandoned instead, nothing is
+    published and CancelledError is raised.
+    """
+    s3 = aws_client("s3", region, timeout=remaining_timeout(deadline))
+
+    def publishable() -> bool:
+        return gate is None or gate.wait(remaining_timeout(deadline))
+
+    key = f"{env}/index.html"
+    content = {"ContentType": "text/html; charset=utf-8", "CacheControl": "no-cache"}
+
+    it = iter(chunks)
+    buf = bytearray()
+    for chunk in it:
+        buf += chunk
+        if len(buf) >= part_size:
+            break
+    else:
+        if not publishable():
+            raise CancelledError()
+        s3.put_object(Bucket=bucket, Key=key, Body=bytes(buf), **content)
+        return f"https://{bucket}.s3.amazonaws.com/{key}"
+
+    upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key, **content)["UploadId"]
+    parts: List[Dict[str, Any]] = []
+    try:
+        def send(data: bytes) -> None:
+            n = len(parts) + 1
+            resp = s3.upload_part(
+                Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=n, Body=data
+            )
+            parts.append({"ETag": resp["ETag"], "PartNumber": n})
+
+        while True:
+            while len(buf) >= part_size:
+                send(bytes(buf[:part_size]))
+                del buf[:part_size]
+            chunk = next(it, None)
+            if chunk is None:
+                break
+            buf += chunk
+        if buf or not parts:
+            send(bytes(buf))
+        if not publishable():
+            raise CancelledError()
+        s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+    return f"https://{bucket}.s3.amazonaws.com/{key}"
+
+
 def put_deployment_tracking(
     region: str,
     table_name: str,
@@ -419,18 +2830,24 @@ def put_deployment_tracking(
     status: str,
     s3_url: str,
     model_used: str,
+    bedrock_regions: Optional[Dict[str, str]] = None,
+    served_by: Optional[str] = None,
+    deadline: Optional[float] = None,
 ) -> None:
-    boto3.resource("dynamodb", region_name=region).Table(table_name).put_item(
-        Item={
-            "deployment_id": deployment_id,
-            "commit_sha": commit_sha,
-            "environment": env,
-            "status": status,
-            "s3_url": s3_url,
-            "model_used": model_used,
-            "timestamp": now_iso(),
-        }
-    )
+    item: Dict[str, Any] = {
+        "deployment_id": deployment_id,
+        "commit_sha": commit_sha,
+        "environment": env,
+        "status": status,
+        "s3_url": s3_url,
+        "model_used": model_used,
+        "timestamp": now_iso(),
+    }
+    if bedrock_regions:
+        item["bedrock_regions"] = bedrock_regions
+    if served_by:
+        item["served_by"] = served_by
+    aws_resource("dynamodb", region, timeout=remaining_timeout(deadline)).Table(table_name).put_item(Item=item)
 
 
 def put_resume_analytics(
@@ -441,26 +2858,39 @@ def put_resume_analytics(
     env: str,
     model_used: str,
     analytics: Dict[str, Any],
+    job_matches: Optional[List[Dict[str, Any]]] = None,
+    served_by: Optional[str] = None,
+    deadline: Optional[float] = None,
 ) -> None:
-    boto3.resource("dynamodb", region_name=region).Table(table_name).put_item(
-        Item={
-            "analysis_id": analytics_id,
-            "commit_sha": commit_sha,
-            "environment": env,
-            "model_used": model_used,
-            "timestamp": now_iso(),
-            "word_count": analytics["word_count"],
-            "ats_score": analytics["ats_score"],
-            "keywords": analytics["keywords"],
-            "readability": analytics["readability"],
-            "missing_sections": analytics["missing_sections"],
-        }
-    )
+    item = {
+        "analysis_id": analytics_id,
+        "commit_sha": commit_sha,
+        "environment": env,
+        "model_used": model_used,
+        "timestamp": now_iso(),
+        "word_count": analytics["word_count"],
+        "ats_score": analytics["ats_score"],
+        "keywords": analytics["keywords"],
+        "readability": analytics["readability"],
+        "missing_sections": analytics["missing_sections"],
+    }
+    if job_matches is not None:
+        # DynamoDB rejects floats; scores go in as Decimal.
+        item["job_matches"] = [
+            {**m, "score": Decimal(str(m["score"]))} for m in job_matches
+        ]
+    if served_by:
+        item["served_by"] = served_by
+    aws_resource("dynamodb", region, timeout=remaining_timeout(deadline)).Table(table_name).put_item(Item=item)
 
 
 # ----------------------------
 # Main
 # ----------------------------
+# A deadline-bound AWS write that ran out of its stage's time.
+_STAGE_TIMEOUT_ERRORS = (DeadlineExceeded, ConnectTimeoutError, ReadTimeoutError)
+
+
 def main() -> int:
     region = require_env("AWS_REGION")
     bedrock_region = os.getenv("BEDROCK_REGION", region)
@@ -471,98 +2901,337 @@ def main() -> int:
     env = require_env("ENV")
     commit_sha = require_env("COMMIT_SHA")
     model_id = require_env("MODEL_ID")
-
-    resume_md = clamp_text(read_text_file("resume.md"), max_chars=12000)
+    stream_fallback = os.getenv("STREAM_FALLBACK", "").lower() in ("1", "true")
+    render_cache_location = os.getenv("RENDER_CACHE", "")
+    section_aliases = load_section_aliases(os.getenv("SECTION_ALIASES", ""))
+    job_index_path = os.getenv("JOB_INDEX", "")
+    job_match_top = int(os.getenv("JOB_MATCH_TOP", "5"))
+    bedrock_parallel = os.getenv("BEDROCK_PARALLEL", "").lower() in ("1", "true")
+    bedrock_stream = os.getenv("BEDROCK_STREAM", "").lower() in ("1", "true")
+    ats_tool = os.getenv("BEDROCK_ATS_TOOL", "").lower() in ("1", "true")
+    response_cache_location = os.getenv("RESPONSE_CACHE", "")
+    circuit_breaker_location = os.getenv("CIRCUIT_BREAKER", "")
+    hedge_regions = [r.strip() for r in os.getenv("BEDROCK_HEDGE_REGIONS", "").split(",") if r.strip()]
+    latency_stats_location = os.getenv("BEDROCK_LATENCY_STATS", "")
+    prompt_mode = os.getenv("BEDROCK_PROMPT_MODE", "split").lower()
+    max_input_tokens = int(os.getenv("BEDROCK_MAX_INPUT_TOKENS", "3500"))
+    max_output_tokens = int(os.getenv("BEDROCK_MAX_OUTPUT_TOKENS", "4096"))
+    bedrock_deadline = float(os.getenv("BEDROCK_DEADLINE", "0"))
+    late_replace = os.getenv("BEDROCK_LATE_REPLACE", "").lower() in ("1", "true")
+    late_max_seconds = float(os.getenv("BEDROCK_LATE_MAX_SECONDS", "120"))
+    model_routes = load_model_routes(os.getenv("MODEL_ROUTES", ""), model_id)
+    run_budget = RunBudget.from_env(os.getenv("RUN_DEADLINE", "0"), os.getenv("RUN_STAGE_BUDGETS", ""))
+    if prompt_mode not in ("split", "combined"):
+        raise RuntimeError(f"BEDROCK_PROMPT_MODE must be split or combined, not {prompt_mode!r}")
+
+    resume_full = read_text_file("resume.md")
+    # The prompts get a token-budgeted copy; the deterministic path renders
+    # and scores the whole file.
+    resume_md, trim_report = fit_resume(resume_full, max_input_tokens)
+    if trim_report["kept_tokens"] < trim_report["estimated_tokens"]:
+        trimmed = trim_report["trimmed_sections"] + (["cut at the budget"] if trim_report["hard_cut"] else [])
+        print(
+            f"WARN: resume trimmed from ~{trim_report['estimated_tokens']} to "
+            f"~{trim_report['kept_tokens']} tokens for Bedrock "
+            f"({', '.join(trimmed)}).",
+            file=sys.stderr,
+        )
+    resume_tokens = estimate_tokens(resume_md)
+    output_budgets = {kind: size_max_tokens(kind, resume_tokens, max_output_tokens) for kind in OUTPUT_BUDGETS}
     deployment_id = str(uuid.uuid4())
     analytics_id = str(uuid.uuid4())
-    used_model = model_id
+    # Model that served each record: html -> DeploymentTracking, ats -> ResumeAnalytics.
+    used_models: Dict[str, str] = {}
+    models_used = {"html": model_id, "ats": model_id}
     used_fallback = False
     fallback_reason = None
+    served_by = "bedrock"
+    late_replaced: Optional[bool] = None
+    started = time.monotonic()
+    html: Optional[str] = None
+    s3_url: Optional[str] = None
+    render_cache: Optional[BlockRenderCache] = None
+    response_cache: Optional[ResponseCache] = None
+    if response_cache_location:
+        response_cache = ResponseCache.from_location(
+            response_cache_location,
+            region=region,
+            ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "100")),
+            evict_every=int(os.getenv("RESPONSE_CACHE_EVICT_EVERY", "0")) or None,
+        )
 
-    # Bedrock-first: attempt AI HTML rendering + ATS analysis
-    try:
-        html_raw = bedrock_invoke_text(
-            bedrock_region=bedrock_region,
-            model_id=model_id,
-            prompt=build_html_prompt(resume_md),
-            max_tokens=4000,
-            temperature=0.2,
-            retries=1,
-            backoff_seconds=2.0,
+    hedge: Optional[RegionHedge] = None
+    if hedge_regions:
+        hedge = RegionHedge(
+            [bedrock_region] + [r for r in hedge_regions if r != bedrock_region],
+            default_delay=float(os.getenv("BEDROCK_HEDGE_DELAY", "10")),
+            latency=LatencyStats.load(latency_stats_location, region=region) if latency_stats_location else None,
         )
-        html = sanitize_html(html_raw, views_api_url=views_api_url)
-
-        ats_raw = bedrock_invoke_text(
-            bedrock_region=bedrock_region,
-            model_id=model_id,
-            prompt=build_ats_json_prompt(resume_md),
-            max_tokens=350,
-            temperature=0.1,
-            retries=1,
-            backoff_seconds=2.0,
+
+    breaker: Optional[CircuitBreaker] = None
+    circuit = CircuitBreaker.CLOSED
+    if circuit_breaker_location:
+        breaker = CircuitBreaker.from_location(
+            circuit_breaker_location,
+            name=f"bedrock:{bedrock_region}:{model_id}",
+            region=region,
+            failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3")),
+            open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "900")),
         )
-        ats = validate_analytics(extract_json(ats_raw))
+        circuit = breaker.allow()
+
+    def deterministic() -> Tuple[Optional[str], Dict[str, Any]]:
+        nonlocal render_cache
+        if render_cache_location and render_cache is None:
+            render_cache = BlockRenderCache.load(render_cache_location, region=region)
+        if stream_fallback:
+            # No Document: the page streams from the file later, and the
+            # analysis is one pass over its blocks.
+            with open("resume.md", "r", encoding="utf-8") as f:
+                return None, validate_analytics(ats_from_blocks(iter_blocks(f), aliases=section_aliases))
+        doc = parse_markdown(resume_full)
+        page = md_to_basic_html(resume_full, views_api_url=views_api_url, doc=doc, cache=render_cache)
+        return page, validate_analytics(basic_ats_analysis(resume_full, doc=doc, aliases=section_aliases))
+
+    render_deadline = run_budget.begin("render")
+    streamed = bedrock_stream and not bedrock_deadline
+    # With a deadline, the page is not streamed: a late answer must not
+    # overwrite the fallback unless BEDROCK_LATE_REPLACE says so.
+    generate = functools.partial(
+        bedrock_generate,
+        bedrock_region=bedrock_region,
+        model_id=model_id,
+        resume_md=resume_md,
+        views_api_url=views_api_url,
+        parallel=bedrock_parallel,
+        html_sink=(
+            functools.partial(upload_stream_to_s3, region, bucket, env, deadline=render_deadline)
+            if streamed else None
+        ),
+        cache=response_cache,
+        policy=PROBE_RETRY_POLICY if circuit == CircuitBreaker.HALF_OPEN else None,
+        hedge=hedge,
+        combined=prompt_mode == "combined",
+        max_tokens=output_budgets,
+        deadline=render_deadline,
+        routes=model_routes,
+        used_models=used_models,
+        ats_tool=ats_tool,
+    )
+    pending: Optional[Future] = None
+    precomputed = None
+
+    # Bedrock-first: attempt AI HTML rendering + ATS analysis
+    try:
+        if circuit == CircuitBreaker.OPEN:
+            raise CircuitOpenError(f"Bedrock circuit open for {bedrock_region}/{model_id}")
+        if bedrock_deadline > 0 or (render_deadline is not None and not streamed):
+            # Race Bedrock against the deterministic result, computed meanwhile,
+            # so neither BEDROCK_DEADLINE nor the render budget is overrun.
+            pending = start_daemon(generate)
+            precomputed = deterministic()
+            limits = [render_deadline - time.monotonic()] if render_deadline is not None else []
+            if bedrock_deadline > 0:
+                limits.append(bedrock_deadline - (time.monotonic() - started))
+            try:
+                html_out, ats = pending.result(timeout=max(0.0, min(limits)))
+            except FutureTimeoutError:
+                raise DeadlineExceeded(f"Bedrock not back within {time.monotonic() - started:.1f}s") from None
+        else:
+            html_out, ats = generate()
+        if streamed:
+            s3_url = html_out
+        else:
+            html = html_out
+        models_used = routed_models(used_models)
+        if breaker:
+            breaker.record_success()
 
     except Exception as e:
         if is_bedrock_fallback_error(e):
+            if breaker and not isinstance(e, (CircuitOpenError, DeadlineExceeded)):
+                breaker.record_failure()
             fallback_reason = type(e).__name__
+            served_by = "fallback-deadline" if isinstance(e, DeadlineExceeded) else "fallback"
             print(
                 f"WARN: Bedrock unavailable ({fallback_reason}: {e}). "
                 "Falling back to deterministic rendering/analytics.",
                 file=sys.stderr,
             )
-            used_model = "fallback-deterministic"
+            models_used = {"html": "fallback-deterministic", "ats": "fallback-deterministic"}
             used_fallback = True
-            html = md_to_basic_html(resume_md, views_api_url=views_api_url)
-            ats = validate_analytics(basic_ats_analysis(resume_md))
+            s3_url = None  # a streamed Bedrock page is replaced by the fallback
+            html, ats = precomputed or deterministic()
         else:
             raise
+    run_budget.end("render")
+
+    # Match against the local job-posting index, if configured
+    analyze_deadline = run_budget.begin("analyze")
+    job_matches: Optional[List[Dict[str, Any]]] = None
+    if job_index_path:
+        def match_jobs() -> List[Dict[str, Any]]:
+            from job_match import load_job_index
+
+            hits = load_job_index(job_index_path).search(resume_full, k=job_match_top)
+            return [
+                {"job_id": h["id"], "title": h["title"], "score": h["score"],
+                 "matched_terms": h["matched_terms"]}
+                for h in hits
+            ]
 
-    # Upload HTML to S3
-    s3_url = upload_html_to_s3(region=region, bucket=bucket, env=env, html=html)
-
-    # Write deployment record
-    put_deployment_tracking(
-        region=region,
-        table_name=deployment_table,
-        deployment_id=deployment_id,
-        commit_sha=commit_sha,
-        env=env,
-        status="success",
-        s3_url=s3_url,
-        model_used=used_model,
-    )
+        try:
+            job_matches = start_daemon(match_jobs, name="job-match").result(
+                timeout=remaining_timeout(analyze_deadline)
+            )
+        except (DeadlineExceeded, FutureTimeoutError):
+            run_budget.exceeded("analyze")
+            print("WARN: job matching skipped (analyze stage out of time).", file=sys.stderr)
+        except Exception as e:
+            print(f"WARN: job matching skipped ({type(e).__name__}: {e}).", file=sys.stderr)
+    run_budget.end("analyze")
 
-    # Write analytics record
-    put_resume_analytics(
-        region=region,
-        table_name=analytics_table,
-        analytics_id=analytics_id,
-        commit_sha=commit_sha,
-        env=env,
-        model_used=used_model,
-        analytics=ats,
-    )
+    # Upload HTML to S3 (already done when the Bedrock page was streamed).
+    # A stage that runs out of time is skipped with a warning; the summary
+    # still goes out (status "degraded", run_budget.exceeded names it).
+    upload_deadline = run_budget.begin("upload")
+    try:
+        if s3_url is None and html is None:
+            # Streamed fallback reads resume.md in chunks instead of holding the page.
+            with open("resume.md", "r", encoding="utf-8") as f:
+                s3_url = upload_stream_to_s3(
+                    region=region,
+                    bucket=bucket,
+                    env=env,
+                    chunks=iter_basic_html(f, views_api_url=views_api_url, cache=render_cache),
+                    deadline=upload_deadline,
+                )
+        elif s3_url is None:
+            s3_url = upload_html_to_s3(region=region, bucket=bucket, env=env, html=html, deadline=upload_deadline)
+    except _STAGE_TIMEOUT_ERRORS as e:
+        run_budget.exceeded("upload")
+        print(f"WARN: page not published, upload stage out of time ({type(e).__name__}: {e}).", file=sys.stderr)
+    run_budget.end("upload")
+
+    if render_cache is not None:
+        try:
+            render_cache.save(render_cache_location, region=region)
+        except Exception as e:
+            print(f"WARN: render cache save failed ({e}).", file=sys.stderr)
+
+    if hedge is not None and latency_stats_location:
+        try:
+            hedge.latency.save(latency_stats_location, region=region)
+        except Exception as e:
+            print(f"WARN: latency stats save failed ({e}).", file=sys.stderr)
+
+    # Write deployment and analytics records
+    record_deadline = run_budget.begin("record")
+    try:
+        put_deployment_tracking(
+            region=region,
+            table_name=deployment_table,
+            deployment_id=deployment_id,
+            commit_sha=commit_sha,
+            env=env,
+            status="success" if s3_url else "upload-timeout",
+            s3_url=s3_url or "",
+            model_used=models_used["html"],
+            bedrock_regions=hedge.winners if hedge and not used_fallback else None,
+            served_by=served_by,
+            deadline=record_deadline,
+        )
+        put_resume_analytics(
+            region=region,
+            table_name=analytics_table,
+            analytics_id=analytics_id,
+            commit_sha=commit_sha,
+            env=env,
+            model_used=models_used["ats"],
+            analytics=ats,
+            job_matches=job_matches,
+            served_by=served_by,
+            deadline=record_deadline,
+        )
+    except _STAGE_TIMEOUT_ERRORS as e:
+        run_budget.exceeded("record")
+        print(f"WARN: records incomplete, record stage out of time ({type(e).__name__}: {e}).", file=sys.stderr)
+    run_budget.end("record")
+
+    # Deadline mode: publish the Bedrock result over the fallback once it lands.
+    if pending is not None and late_replace and served_by == "fallback-deadline":
+        late_replaced = False
+        try:
+            late_html, late_ats = pending.result(timeout=late_max_seconds)
+        except FutureTimeoutError:
+            print(f"WARN: Bedrock still not back after {late_max_seconds:g}s more; keeping the fallback.", file=sys.stderr)
+        except Exception as e:
+            print(f"WARN: late Bedrock result failed ({type(e).__name__}: {e}); keeping the fallback.", file=sys.stderr)
+        else:
+            models_used = routed_models(used_models)
+            s3_url = upload_html_to_s3(region=region, bucket=bucket, env=env, html=late_html)
+            put_deployment_tracking(
+                region=region,
+                table_name=deployment_table,
+                deployment_id=deployment_id,
+                commit_sha=commit_sha,
+                env=env,
+                status="success",
+                s3_url=s3_url,
+                model_used=models_used["html"],
+                bedrock_regions=hedge.winners if hedge else None,
+                served_by="bedrock-late",
+            )
+            put_resume_analytics(
+                region=region,
+                table_name=analytics_table,
+                analytics_id=analytics_id,
+                commit_sha=commit_sha,
+                env=env,
+                model_used=models_used["ats"],
+                analytics=late_ats,
+                job_matches=job_matches,
+                served_by="bedrock-late",
+            )
+            if breaker:
+                breaker.record_success()
+            late_replaced = True
 
     print(
         json.dumps(
             {
-                "status": "ok",
+                "status": "degraded" if run_budget.overrun else "ok",
                 "environment": env,
                 "commit_sha": commit_sha,
                 "s3_url": s3_url,
                 "deployment_id": deployment_id,
                 "analysis_id": analytics_id,
-                "model_used": used_model,
+                "model_used": models_used,
+                "model_routes": model_routes,
                 "used_fallback": used_fallback,
                 "fallback_reason": fallback_reason,
+                "served_by": served_by,
+                "late_replaced": late_replaced,
                 "bedrock_region": bedrock_region,
+                "bedrock_parallel": bedrock_parallel,
+                "prompt_mode": prompt_mode,
+                "ats_tool": ats_tool,
+                "token_budget": {"input": trim_report, "max_tokens": output_budgets},
+                "circuit": circuit if breaker else None,
+                "hedge": hedge.stats() if hedge else None,
                 "view_tracking": bool(views_api_url),
+                "render_cache": render_cache.stats() if render_cache else None,
+                "response_cache": response_cache.stats() if response_cache else None,
+                "job_matches": job_matches,
+                "aws_clients": aws_client_stats(),
+                "bedrock_calls": bedrock_call_stats(),
+                "run_budget": run_budget.report(),
             },
             indent=2,
         )
     )
-    return 0
+    return 0 if s3_url else 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark batch_ats_analysis (NumPy) against a basic_ats_analysis loop.
+
+Builds a corpus of synthetic resumes (varied size, markup density and
+section mix), scores it both ways at each size, checks the results are
+identical and reports documents/second and the speedup.
+
+Usage:
+    python benchmarks/bench_ats_batch.py                 # 10k and 100k docs
+    python benchmarks/bench_ats_batch.py --sizes 1000 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "app"))
+sys.path.insert(0, HERE)
+
+from ats_batch import batch_ats_analysis  # noqa: E402
+from bench_renderer import synth_resume  # noqa: E402
+from resume_pipeline import basic_ats_analysis  # noqa: E402
+
+_SECTION_HEADINGS = ("## EXPERIENCE", "## PROJECTS", "## SKILLS", "## SUMMARY")
+
+
+def build_corpus(n: int, pool_size: int = 500, seed: int = 11) -> List[str]:
+    """n documents drawn from a pool of distinct synthetic resumes."""
+    rng = random.Random(seed)
+    pool = []
+    for i in range(min(n, pool_size)):
+        md = synth_resume(rng.choice((1500, 3000, 6000)), rng.choice((0.0, 0.1, 0.3)), seed=i)
+        for h in _SECTION_HEADINGS:
+            if rng.random() < 0.25:
+                md = md.replace(h, "### " + h[3:])
+        if rng.random() < 0.5:
+            md += "\n## EDUCATION\n\n**State University** | B.S.\n"
+        pool.append(md)
+    return [pool[i % len(pool)] for i in range(n)]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = ap.parse_args()
+
+    for n in args.sizes:
+        corpus = build_corpus(n)
+        mb = sum(len(md) for md in corpus) / 1e6
+
+        t0 = time.perf_counter()
+        scalar = [basic_ats_analysis(md) for md in corpus]
+        t_scalar = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        batch = batch_ats_analysis(corpus)
+        t_batch = time.perf_counter() - t0
+
+        if batch != scalar:
+            bad = next(i for i, (a, b) in enumerate(zip(scalar, batch)) if a != b)
+            print(f"MISMATCH at document {bad}: {scalar[bad]} != {batch[bad]}", file=sys.stderr)
+            return 1
+
+        print(
+            f"{n:>8} docs ({mb:7.1f} MB)  scalar {t_scalar:8.2f} s ({n / t_scalar:9.0f} docs/s)  "
+            f"batch {t_batch:8.2f} s ({n / t_batch:9.0f} docs/s)  speedup {t_scalar / t_batch:5.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Offline load test of the Bedrock path against app/fake_bedrock.py.
+
+Each simulated run calls bedrock_generate against a FakeBedrock and, on a
+fallback error, renders and scores the resume deterministically, the way
+main() does. Runs are spread over --workers threads. Reports runs/second,
+wall-time percentiles, how runs were served (bedrock, or fallback by
+error type), retries/continuations and what the fake injected.
+
+--time-scale shrinks injected latency and retry backoff alike (0.01 turns
+a 2 s call into 20 ms), so hundreds of runs take seconds while the
+retry/fallback decisions stay the same.
+
+Usage:
+    python benchmarks/bench_bedrock_offline.py --runs 1000
+    python benchmarks/bench_bedrock_offline.py --runs 500 --workers 16 \\
+        --profile '{"latency": "lognormal:2,0.6", "throttle": 0.2, "truncate": 0.1}'
+    python benchmarks/bench_bedrock_offline.py --combined --profile '{"quota": 0.05}'
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from fake_bedrock import FakeBedrock, FaultProfile, installed  # noqa: E402
+from resume_pipeline import (  # noqa: E402
+    RETRY_MATRIX,
+    RetryPolicy,
+    basic_ats_analysis,
+    bedrock_call_stats,
+    bedrock_generate,
+    fit_resume,
+    is_bedrock_fallback_error,
+    md_to_basic_html,
+    parse_markdown,
+    read_text_file,
+)
+
+
+def simulate_run(resume_full: str, resume_md: str, policy: RetryPolicy, args: argparse.Namespace) -> Tuple[str, float]:
+    t0 = time.perf_counter()
+    try:
+        bedrock_generate(
+            bedrock_region="fake-1",
+            model_id="fake-model",
+            resume_md=resume_md,
+            parallel=args.parallel,
+            policy=policy,
+            combined=args.combined,
+            ats_tool=args.ats_tool,
+        )
+        served = "bedrock"
+    except Exception as e:
+        if not is_bedrock_fallback_error(e):
+            raise
+        doc = parse_markdown(resume_full)
+        md_to_basic_html(resume_full, doc=doc)
+        basic_ats_analysis(resume_full, doc=doc)
+        served = f"fallback:{type(e).__name__}"
+    return served, time.perf_counter() - t0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--resume", default=os.path.join(ROOT, "resume.md"))
+    ap.add_argument("--runs", type=int, default=500)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--profile", default='{"latency": "lognormal:2,0.5", "throttle": 0.1}',
+                    help="FaultProfile keyword arguments as JSON")
+    ap.add_argument("--time-scale", type=float, default=0.01)
+    ap.add_argument("--parallel", action="store_true", help="issue the split calls concurrently")
+    ap.add_argument("--combined", action="store_true", help="one combined prompt per run")
+    ap.add_argument("--ats-tool", action="store_true", help="ATS analytics as a tool call (BEDROCK_ATS_TOOL)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    resume_full = read_text_file(args.resume)
+    resume_md, _ = fit_resume(resume_full, int(os.getenv("BEDROCK_MAX_INPUT_TOKENS", "3500")))
+    spec: Dict[str, Any] = {"time_scale": args.time_scale, **json.loads(args.profile)}
+    fake = FakeBedrock(FaultProfile.from_spec(spec), seed=args.seed)
+    policy = RetryPolicy({
+        name: (retries, base * args.time_scale, cap * args.time_scale)
+        for name, (retries, base, cap) in RETRY_MATRIX.items()
+    })
+
+    t0 = time.perf_counter()
+    with installed(fake), ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(lambda _: simulate_run(resume_full, resume_md, policy, args), range(args.runs)))
+    elapsed = time.perf_counter() - t0
+
+    times = sorted(t for _, t in results)
+
+    def pct(q: float) -> float:
+        return round(times[min(len(times) - 1, int(q * len(times)))] * 1000, 2)
+
+    calls = bedrock_call_stats()
+    report = {
+        "runs": args.runs,
+        "runs_per_s": round(args.runs / elapsed, 1),
+        "ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "mean": round(statistics.mean(times) * 1000, 2)},
+        "served": dict(Counter(served for served, _ in results)),
+        "retries": calls["retries"],
+        "continuations": calls["usage"].get("continuations", 0),
+        "injected": fake.stats(),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"{report['runs']} runs in {elapsed:.2f} s  ({report['runs_per_s']} runs/s, {args.workers} workers)")
+    print("wall ms  " + "  ".join(f"{k} {v}" for k, v in report["ms"].items()))
+    print("served   " + "  ".join(f"{k} {v}" for k, v in sorted(report["served"].items())))
+    print("retries  " + (", ".join(f"{k} {v}" for k, v in sorted(report["retries"].items())) or "none")
+          + f"  continuations {report['continuations']}")
+    print("injected " + "  ".join(f"{k} {v}" for k, v in sorted(report["injected"].items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark the two Bedrock prompt modes of bedrock_generate.
+
+"split" sends build_html_prompt and build_ats_json_prompt as two requests
+(sequentially, or concurrently with --parallel); "combined" sends
+build_combined_prompt once and splits the answer locally. Each mode is run
+--rounds times against the same resume and reports wall-time percentiles
+and the input/output tokens Bedrock billed per run.
+
+--estimate-only skips Bedrock and compares estimated input tokens of the
+prompts, which needs no credentials.
+
+Usage:
+    python benchmarks/bench_bedrock_prompts.py --estimate-only
+    python benchmarks/bench_bedrock_prompts.py --region us-east-1 \\
+        --model anthropic.claude-3-5-sonnet-20240620-v1:0 --rounds 5
+
+Calls cost real tokens; use a small --rounds.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from resume_pipeline import (  # noqa: E402
+    bedrock_call_stats,
+    bedrock_generate,
+    build_ats_json_prompt,
+    build_combined_prompt,
+    build_html_prompt,
+    estimate_tokens,
+    fit_resume,
+    read_text_file,
+)
+
+
+def estimate(resume_md: str) -> Dict[str, int]:
+    return {
+        "split": estimate_tokens(build_html_prompt(resume_md)) + estimate_tokens(build_ats_json_prompt(resume_md)),
+        "combined": estimate_tokens(build_combined_prompt(resume_md)),
+    }
+
+
+def run_mode(resume_md: str, region: str, model: str, mode: str, rounds: int, parallel: bool) -> Dict[str, Any]:
+    times: List[float] = []
+    before = dict(bedrock_call_stats()["usage"])
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        bedrock_generate(
+            bedrock_region=region,
+            model_id=model,
+            resume_md=resume_md,
+            parallel=parallel,
+            combined=mode == "combined",
+        )
+        times.append(time.perf_counter() - t0)
+    after = bedrock_call_stats()["usage"]
+    times.sort()
+    return {
+        "mode": mode,
+        "rounds": rounds,
+        "p50_s": round(statistics.median(times), 3),
+        "max_s": round(times[-1], 3),
+        "calls_per_run": (after.get("calls", 0) - before.get("calls", 0)) / rounds,
+        "input_tokens_per_run": (after.get("input_tokens", 0) - before.get("input_tokens", 0)) / rounds,
+        "output_tokens_per_run": (after.get("output_tokens", 0) - before.get("output_tokens", 0)) / rounds,
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--resume", default=os.path.join(ROOT, "resume.md"))
+    ap.add_argument("--region", default=os.getenv("BEDROCK_REGION") or os.getenv("AWS_REGION", ""))
+    ap.add_argument("--model", default=os.getenv("MODEL_ID", ""))
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--parallel", action="store_true", help="issue the split calls concurrently")
+    ap.add_argument("--estimate-only", action="store_true")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    resume_md, _ = fit_resume(read_text_file(args.resume), int(os.getenv("BEDROCK_MAX_INPUT_TOKENS", "3500")))
+    est = estimate(resume_md)
+    if args.estimate_only:
+        saved = 1 - est["combined"] / est["split"]
+        print(json.dumps(est) if args.json else (
+            f"estimated input tokens  split {est['split']}  combined {est['combined']}  ({saved:.0%} fewer)"
+        ))
+        return 0
+    if not args.region or not args.model:
+        ap.error("--region and --model (or BEDROCK_REGION/AWS_REGION and MODEL_ID) are required")
+
+    results = [
+        run_mode(resume_md, args.region, args.model, mode, args.rounds, args.parallel)
+        for mode in ("split", "combined")
+    ]
+    if args.json:
+        print(json.dumps({"estimated_input_tokens": est, "results": results}, indent=2))
+        return 0
+    for r in results:
+        print(
+            f"{r['mode']:>9}  p50 {r['p50_s']:7.2f} s  max {r['max_s']:7.2f} s  "
+            f"calls {r['calls_per_run']:.0f}  in {r['input_tokens_per_run']:7.0f}  out {r['output_tokens_per_run']:7.0f} tokens/run"
+        )
+    split, combined = results
+    print(
+        f"combined vs split: latency {combined['p50_s'] / max(split['p50_s'], 1e-3):.2f}x, "
+        f"input tokens {combined['input_tokens_per_run'] / max(1, split['input_tokens_per_run']):.2f}x"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the deterministic fallback renderer.
+
+Covers render_inline (per line), md_to_basic_html (whole document) and
+sanitize_html (fenced HTML) over synthetic resumes from 1 KB to 10 MB at
+several inline-markup densities. Reports throughput (MB/s of input),
+per-call latency percentiles and peak allocations (tracemalloc).
+
+--adversarial runs render_inline on lines built to hurt regex-based
+emphasis matching (snake_case, URLs, stray/unmatched * and _) at growing
+lengths, next to the old chained-re.sub renderer, and reports the fitted
+scaling exponent. --check-linear fails if any exponent exceeds 1.25.
+
+--check-identical renders every line of the synthetic corpus (up to
+--max-size, all densities) and of the adversarial corpus (all lengths)
+with both render_inline and the old renderer, and fails on the first
+lines whose output differs.
+
+Usage:
+    python benchmarks/bench_renderer.py                 # full matrix
+    python benchmarks/bench_renderer.py --max-size 1MB  # skip the big ones
+    python benchmarks/bench_renderer.py --save-baseline
+    python benchmarks/bench_renderer.py --compare       # exit 1 on regression
+    python benchmarks/bench_renderer.py --adversarial --check-linear
+    python benchmarks/bench_renderer.py --check-identical --max-size 1MB
+
+Baselines live in benchmarks/baselines/renderer.json. Numbers are machine
+dependent; refresh the baseline on the runner you compare against.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import re
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from resume_pipeline import md_to_basic_html, render_inline, sanitize_html  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "renderer.json")
+
+SIZES = {"1KB": 1 << 10, "10KB": 10 << 10, "100KB": 100 << 10, "1MB": 1 << 20, "10MB": 10 << 20}
+DENSITIES = (0.0, 0.1, 0.5)
+
+_WORDS = (
+    "AWS Terraform pipeline deployed automated production infrastructure Lambda "
+    "CloudWatch reduced incident response latency across environments secure "
+    "governance drift remediation VPC routing IAM policy engineers observability "
+    "Kubernetes GitHub Actions DynamoDB Bedrock throughput availability"
+).split()
+_MARKUP = (("**", "**"), ("*", "*"), ("`", "`"), ("_", "_"), ("***", "***"), ("__", "__"))
+
+
+# ----------------------------
+# Synthetic corpus
+# ----------------------------
+def synth_line(rng: random.Random, n_words: int, density: float) -> str:
+    out = []
+    for _ in range(n_words):
+        w = rng.choice(_WORDS)
+        if density and rng.random() < density:
+            o, c = rng.choice(_MARKUP)
+            w = f"{o}{w}{c}"
+        out.append(w)
+    return " ".join(out)
+
+
+def synth_resume(size: int, density: float, seed: int = 7) -> str:
+    """
+    Deterministic resume-shaped markdown of at least size bytes: an h1,
+    then repeating h2 sections of h3 roles, bold date lines, bullets,
+    paragraphs and rules. density is the fraction of marked-up words.
+    """
+    rng = random.Random(seed)
+    parts = [f"# {synth_line(rng, 3, 0)}", synth_line(rng, 12, density), ""]
+    total = sum(len(p) + 1 for p in parts)
+    while total < size:
+        section = [f"## {rng.choice(['EXPERIENCE', 'PROJECTS', 'SKILLS', 'SUMMARY'])}", ""]
+        for _ in range(rng.randint(2, 4)):
+            section.append(f"### {synth_line(rng, 4, 0)} | {synth_line(rng, 3, 0)}")
+            section.append(f"**{rng.randint(2010, 2025)} – Present**")
+            section.append("")
+            section.extend(f"- {synth_line(rng, rng.randint(15, 35), density)}" for _ in range(rng.randint(3, 6)))
+            section.append("")
+        section.append(synth_line(rng, 40, density))
+        section.append("---")
+        section.append("")
+        parts.extend(section)
+        total += sum(len(p) + 1 for p in section)
+    return "\n".join(parts)
+
+
+# ----------------------------
+# Adversarial corpus
+# ----------------------------
+ADVERSARIAL = {
+    "snake_case": lambda n: "resume_pipeline_md_to_basic_html " * (n // 33),
+    "urls": lambda n: "https://example.com/a_b/c_d?x=e_f&y=g_h " * (n // 41),
+    "unmatched_star": lambda n: "*" + "a" * (n - 1),
+    "unmatched_under": lambda n: "_" + "word " * (n // 5),
+    "alternating": lambda n: "*a" * (n // 2),
+    "triple_opener": lambda n: "***" + "**a" * (n // 3),
+    "mixed_delims": lambda n: "_*`" * (n // 3),
+    "under_star": lambda n: "_a*b" * (n // 4),
+}
+ADVERSARIAL_LENGTHS = (1_000, 4_000, 16_000, 64_000)
+
+
+def legacy_render_inline(text: str) -> str:
+    """The chained re.sub renderer render_inline replaced; kept for comparison."""
+    text = (
+        text.replace("&", "&amp;")
+            .replace("<", "&lt;")
+            .replace(">", "&gt;")
+            .replace('"', "&quot;")
+            .replace("'", "&#39;")
+    )
+    text = re.sub(r"\*\*\*(.*?)\*\*\*", r"<strong><em>\1</em></strong>", text)
+    text = re.sub(r"___(.*?)___", r"<strong><em>\1</em></strong>", text)
+    text = re.sub(r"\*\*(.*?)\*\*", r"<strong>\1</strong>", text)
+    text = re.sub(r"__(.*?)__", r"<strong>\1</strong>", text)
+    text = re.sub(r"\*(.*?)\*", r"<em>\1</em>", text)
+    text = re.sub(r"_(.*?)_", r"<em>\1</em>", text)
+    text = re.sub(r"`([^`]+)`", r"<code>\1</code>", text)
+    return text
+
+
+def scaling_exponent(lengths: List[int], times: List[float]) -> float:
+    """Least-squares slope of log(time) over log(length): 1.0 is linear."""
+    xs = [math.log(n) for n in lengths]
+    ys = [math.log(max(t, 1e-9)) for t in times]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    num = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    den = sum((x - mx) ** 2 for x in xs)
+    return num / den if den else 0.0
+
+
+def run_adversarial() -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for name, build in ADVERSARIAL.items():
+        row: Dict[str, Any] = {}
+        for label, fn in (("render_inline", render_inline), ("legacy", legacy_render_inline)):
+            times = []
+            for n in ADVERSARIAL_LENGTHS:
+                line = build(n)
+                times.append(measure(lambda: fn(line), len(line), budget_s=0.2)["p50_ms"])
+            row[label] = {
+                "p50_ms": dict(zip(map(str, ADVERSARIAL_LENGTHS), times)),
+                "exponent": round(scaling_exponent(list(ADVERSARIAL_LENGTHS), times), 3),
+            }
+        results[name] = row
+        print(
+            f"{name:>16}  render_inline {row['render_inline']['p50_ms'][str(ADVERSARIAL_LENGTHS[-1])]:>9.3f} ms "
+            f"(exp {row['render_inline']['exponent']:.2f})   legacy "
+            f"{row['legacy']['p50_ms'][str(ADVERSARIAL_LENGTHS[-1])]:>9.3f} ms "
+            f"(exp {row['legacy']['exponent']:.2f})   @ {ADVERSARIAL_LENGTHS[-1]} chars"
+        )
+    return results
+
+
+def check_identical(max_size: int, limit: int = 5) -> List[str]:
+    """Lines where render_inline and legacy_render_inline disagree (at most limit)."""
+    corpora = [
+        (f"{label}@{density}", synth_resume(size, density).splitlines())
+        for label, size in SIZES.items() if size <= max_size
+        for density in DENSITIES
+    ]
+    corpora += [
+        (f"{name}@{n}", [build(n)])
+        for name, build in ADVERSARIAL.items()
+        for n in ADVERSARIAL_LENGTHS
+    ]
+    mismatches: List[str] = []
+    for key, lines in corpora:
+        for i, line in enumerate(lines):
+            new, old = render_inline(line), legacy_render_inline(line)
+            if new != old:
+                mismatches.append(f"{key} line {i}: {line[:60]!r} -> {new[:60]!r} vs legacy {old[:60]!r}")
+                if len(mismatches) >= limit:
+                    return mismatches
+        print(f"{key:>22}  {len(lines)} lines identical")
+    return mismatches
+
+
+# ----------------------------
+# Measurement
+# ----------------------------
+def percentile(samples: List[float], q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+
+def measure(fn: Callable[[], Any], nbytes: int, min_runs: int = 3, budget_s: float = 1.0) -> Dict[str, float]:
+    fn()  # warm-up
+    samples: List[float] = []
+    start = time.perf_counter()
+    while len(samples) < min_runs or (time.perf_counter() - start < budget_s and len(samples) < 1000):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50 = percentile(samples, 0.50)
+    return {
+        "runs": len(samples),
+        "mb_per_s": round(nbytes / p50 / 1e6, 3) if p50 else 0.0,
+        "p50_ms": round(p50 * 1e3, 4),
+        "p90_ms": round(percentile(samples, 0.90) * 1e3, 4),
+        "p99_ms": round(percentile(samples, 0.99) * 1e3, 4),
+        "peak_alloc_kb": round(peak / 1024, 1),
+    }
+
+
+def bench_case(md: str) -> Dict[str, Dict[str, float]]:
+    nbytes = len(md.encode("utf-8"))
+    lines = md.splitlines()
+    html = md_to_basic_html(md)
+    fenced = f"```html\n{html}\n```"
+    return {
+        "render_inline": measure(lambda: [render_inline(ln) for ln in lines], nbytes),
+        "md_to_basic_html": measure(lambda: md_to_basic_html(md), nbytes),
+        "sanitize_html": measure(lambda: sanitize_html(fenced, "https://example.invalid/views"),
+                                 len(fenced.encode("utf-8"))),
+    }
+
+
+def run(max_size: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for label, size in SIZES.items():
+        if size > max_size:
+            continue
+        for density in DENSITIES:
+            key = f"{label}@{density}"
+            results[key] = bench_case(synth_resume(size, density))
+            for target, m in results[key].items():
+                print(
+                    f"{key:>12}  {target:<17} {m['mb_per_s']:>9.2f} MB/s  "
+                    f"p50 {m['p50_ms']:>10.3f} ms  p90 {m['p90_ms']:>10.3f} ms  "
+                    f"p99 {m['p99_ms']:>10.3f} ms  peak {m['peak_alloc_kb']:>10.1f} KB"
+                )
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for key, targets in results.items():
+        for target, m in targets.items():
+            base = baseline.get("results", {}).get(key, {}).get(target)
+            if not base or not base.get("mb_per_s"):
+                continue
+            ratio = m["mb_per_s"] / base["mb_per_s"]
+            if ratio < 1 - tolerance:
+                regressions.append(
+                    f"{key} {target}: {m['mb_per_s']:.2f} MB/s vs baseline "
+                    f"{base['mb_per_s']:.2f} MB/s ({(1 - ratio) * 100:.0f}% slower)"
+                )
+    return regressions
+
+
+def parse_size(s: str) -> int:
+    s = s.strip().upper()
+    if s in SIZES:
+        return SIZES[s]
+    return int(s)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--max-size", default="10MB", help="largest corpus to run (1KB..10MB or bytes)")
+    ap.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE_PATH}")
+    ap.add_argument("--compare", action="store_true", help="compare throughput against the stored baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed throughput drop before failing")
+    ap.add_argument("--json", help="also write results to this path")
+    ap.add_argument("--adversarial", action="store_true", help="run the pathological-line corpus instead")
+    ap.add_argument("--check-linear", action="store_true", help="with --adversarial, exit 1 on superlinear scaling")
+    ap.add_argument("--check-identical", action="store_true",
+                    help="exit 1 if render_inline output differs from the old renderer on either corpus")
+    args = ap.parse_args()
+
+    if args.check_identical:
+        mismatches = check_identical(parse_size(args.max_size))
+        for m in mismatches:
+            print(f"MISMATCH: {m}", file=sys.stderr)
+        return 1 if mismatches else 0
+
+    if args.adversarial:
+        adv = run_adversarial()
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(adv, f, indent=2)
+        if args.check_linear:
+            bad = [k for k, v in adv.items() if v["render_inline"]["exponent"] > 1.25]
+            for k in bad:
+                print(f"SUPERLINEAR: render_inline on {k} (exp {adv[k]['render_inline']['exponent']})",
+                      file=sys.stderr)
+            return 1 if bad else 0
+        return 0
+
+    results = run(parse_size(args.max_size))
+    doc = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written: {BASELINE_PATH}")
+    if args.compare:
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION: {r}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+import time
+
+import pytest
+
+from resume_pipeline import MalformedResponseError, extract_json, is_bedrock_fallback_error
+
+
+def test_object_inside_prose():
+    text = 'Here you go: {"note": "a {b}"} and then {"ats_score": 80}'
+    assert extract_json(text) == {"note": "a {b}"}
+    assert extract_json('Sure! {"ats_score": 80}\nHope that helps.') == {"ats_score": 80}
+
+
+def test_deeply_nested_output_is_a_fallback_error():
+    with pytest.raises(MalformedResponseError) as info:
+        extract_json('{"a":' * 100_000)
+    assert is_bedrock_fallback_error(info.value)
+
+
+def test_long_chatty_answer_is_not_quadratic():
+    # Tens of thousands of "{" that never start an object: one decode attempt each used to be O(n^2).
+    text = '{"x": "' * 50_000 + "no json here " * 20_000
+    started = time.perf_counter()
+    with pytest.raises(MalformedResponseError):
+        extract_json(text)
+    assert time.perf_counter() - started < 1.0
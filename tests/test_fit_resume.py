@@ -0,0 +1,45 @@
+from resume_pipeline import estimate_tokens, fit_resume
+
+PARAGRAPH = " ".join(f"Led migration number {i} of the platform to AWS." for i in range(300))
+
+
+def test_single_paragraph_section_is_cut_not_dropped():
+    md = f"# Jane Doe\n\n## SUMMARY\n\n{PARAGRAPH}\n\n## SKILLS\n\n- AWS\n"
+    text, report = fit_resume(md, 1000)
+
+    assert report["hard_cut"]
+    assert report["trimmed_sections"] == ["## SUMMARY"]
+    assert 900 <= report["kept_tokens"] <= 1000
+    assert report["kept_tokens"] == estimate_tokens(text)
+    summary = text.split("## SUMMARY\n\n", 1)[1].split("\n\n## SKILLS", 1)[0]
+    assert summary.startswith("Led migration number 0 ")
+    assert summary.endswith("to AWS.")  # cut at a sentence break
+    assert text.endswith("## SKILLS\n\n- AWS\n")
+
+
+def test_heading_less_resume_is_cut_to_budget():
+    text, report = fit_resume("word " * 5000, 100)
+
+    assert report["hard_cut"]
+    assert report["kept_tokens"] == estimate_tokens(text) == 100
+    assert text == "word " * 99 + "word\n\n"
+
+
+def test_wrapped_paragraph_is_cut_at_a_line_break():
+    lines = ["wrapped line of a long paragraph here"] * 400
+    text, report = fit_resume("# Title\n\n" + "\n".join(lines) + "\n", 200)
+
+    assert report["hard_cut"]
+    assert 180 <= report["kept_tokens"] <= 200
+    assert text.startswith("# Title\n\nwrapped line")
+    assert text.rstrip("\n").endswith("paragraph here")
+
+
+def test_bullets_are_still_dropped_whole():
+    bullets = "".join(f"- Shipped feature {i} to production with zero downtime.\n" for i in range(200))
+    md = f"# Jane Doe\n\n## EXPERIENCE\n\n{bullets}\n## SKILLS\n\n- AWS\n"
+    text, report = fit_resume(md, 500)
+
+    assert not report["hard_cut"]
+    assert report["kept_tokens"] <= 500
+    assert all(line.endswith("downtime.") for line in text.splitlines() if line.startswith("- Shipped"))